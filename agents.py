@@ -11,7 +11,10 @@ Fluxo do tool use Anthropic:
 
 import os
 import json
+import asyncio
+from functools import lru_cache
 from pathlib import Path
+from typing import NamedTuple
 from anthropic import Anthropic
 from dotenv import dotenv_values
 from skills import (
@@ -19,9 +22,13 @@ from skills import (
     skill_check_protection, skill_log_alert, skill_read_balance,
     skill_read_history, skill_generate_report,
 )
+from config import carregar_config
+
+# Diretorio do projeto (resolvido uma vez no import)
+_BASE_DIR = Path(__file__).resolve().parent
 
 # Carrega .env com dotenv_values (mais robusto que load_dotenv)
-_env = dotenv_values(Path(__file__).resolve().parent / ".env")
+_env = dotenv_values(_BASE_DIR / ".env")
 os.environ.update(_env)
 
 
@@ -154,15 +161,15 @@ OPERACAO:
 - read_balance: consultar saldo (saldo_atual, lucro_acumulado, total_operacoes)
 - calculate_mg: calcular tabela Martingale (Entrada, MG1, MG2, perda total)
 - execute_operation: executar trade (asset, direction call/put, amount)
-- register_operation: salvar no operacoes.json com TODOS os campos
+- register_operation: salvar no operacoes.jsonl com TODOS os campos
 
 HISTORICO E RELATORIO:
-- read_history: ler ultimas operacoes do operacoes.json (filtro por asset, limit)
+- read_history: ler ultimas operacoes do operacoes.jsonl (filtro por asset, limit)
 - generate_report: relatorio completo (taxa acerto, lucro, cenarios 3, stats)
 
 PROTECAO:
 - check_protection: verifica se pode operar (perda%, loss streak, cenarios 3)
-- log_alert: registra alerta em alertas.json (STOP_LOSS, CENARIO_3, etc)
+- log_alert: registra alerta em alertas.jsonl (STOP_LOSS, CENARIO_3, etc)
 
 ANALISE:
 - analisar_sentimento: sentimento de texto de mercado
@@ -412,11 +419,9 @@ class AgentProtetor:
 
     @classmethod
     def from_config(cls) -> "AgentProtetor":
-        """Cria AgentProtetor lendo parametros do config.json."""
+        """Cria AgentProtetor lendo parametros do config.json (via carregar_config)."""
         try:
-            config_path = Path(__file__).resolve().parent / "data" / "config.json"
-            with open(config_path, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
+            cfg = carregar_config()
             return cls(
                 limite_perda_pct=float(cfg.get("stop_loss_pct", 20.0)),
                 stop_loss_reais=cfg.get("stop_loss_reais"),
@@ -433,7 +438,7 @@ class AgentProtetor:
 
         Chamado no inicio da sessao e apos cada operacao.
         Quando definido, o verificar() usa este valor em vez de
-        calcular pelo historico de operacoes.json.
+        calcular pelo historico de operacoes.jsonl.
         """
         if self._saldo_real is None:
             # Primeira sincronizacao: define o saldo de referencia da sessao
@@ -876,8 +881,7 @@ class AgentAnalisador:
 
         # --- Salvar em arquivo ---
         if salvar:
-            from pathlib import Path as _Path
-            arquivo = _Path(__file__).resolve().parent / "logs" / "relatorio.txt"
+            arquivo = _BASE_DIR / "logs" / "relatorio.txt"
             timestamp_header = f"Gerado em: {agora}\n{'=' * 50}\n\n"
             with open(arquivo, "w", encoding="utf-8") as f:
                 f.write(timestamp_header + texto + "\n")
@@ -957,11 +961,9 @@ class AgentVerificador:
 
     @classmethod
     def from_config(cls) -> "AgentVerificador":
-        """Cria AgentVerificador lendo parametros do config.json."""
+        """Cria AgentVerificador lendo parametros do config.json (via carregar_config)."""
         try:
-            config_path = Path(__file__).resolve().parent / "data" / "config.json"
-            with open(config_path, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
+            cfg = carregar_config()
             return cls(ativo=bool(cfg.get("verificador_ativo", True)))
         except Exception:
             return cls()
@@ -1064,6 +1066,31 @@ class AgentVerificador:
 # AGENT QUOTEX (conexao websocket com corretora)
 # ============================================================
 
+@lru_cache(maxsize=512)
+def _asset_para_display(asset: str) -> str:
+    """Mapeia asset code para nome display usado por get_payment().
+
+    EURUSD_otc -> EUR/USD (OTC), EURUSD -> EUR/USD
+    """
+    nome = asset.replace("_otc", "").upper()
+    # Insere / entre as moedas: EURUSD -> EUR/USD
+    if len(nome) == 6 and nome.isalpha():
+        nome = f"{nome[:3]}/{nome[3:]}"
+    # Adiciona (OTC) se _otc
+    if "_otc" in asset.lower():
+        return f"{nome} (OTC)"
+    return nome
+
+
+class OpResult(NamedTuple):
+    """Resultado de AgentQuotex.operar (acesso por atributo: result.profit)."""
+    success: bool
+    profit: float = 0.0
+    result: str = ""          # WIN | LOSS | DOJI ("" quando success=False)
+    erro: str = ""
+    detalhes: str = ""
+
+
 class AgentQuotex:
     """Agente responsavel pela conexao websocket com a Quotex via PyQuotex.
 
@@ -1123,9 +1150,12 @@ class AgentQuotex:
     async def get_saldo(self) -> dict:
         """Retorna saldo da conta (demo ou real conforme account_mode)."""
         self._checar_conexao()
-        balance = await self.client.get_balance()
+        # Saldo e perfil sao RPCs independentes: dispara os dois juntos.
+        # gather (e nao TaskGroup) para erros de get_balance chegarem sem ExceptionGroup.
+        balance, profile = await asyncio.gather(
+            self.client.get_balance(), self._get_profile_seguro(),
+        )
         try:
-            profile = await self.client.get_profile()
             demo_balance = float(profile.demo_balance)
             live_balance = float(profile.live_balance)
             usuario = profile.nick_name
@@ -1143,6 +1173,13 @@ class AgentQuotex:
             "usuario": usuario,
         }
 
+    async def _get_profile_seguro(self):
+        """get_profile() que retorna None em vez de levantar excecao."""
+        try:
+            return await self.client.get_profile()
+        except Exception:
+            return None
+
     # --- Verificar asset ---
     async def check_asset(self, asset: str) -> dict:
         """Verifica se um ativo esta disponivel e aberto para trading.
@@ -1168,21 +1205,13 @@ class AgentQuotex:
 
         Usa get_payment() (sync) que retorna todos os payouts.
         Busca pelo nome display do asset (ex: 'EUR/USD (OTC)').
+
+        O pyquotex mantem esse dict atualizado pelo proprio websocket (nao ha
+        API de callback por ativo), entao a consulta e local e sem round-trip.
         """
         self._checar_conexao()
         payments = self.client.get_payment()
-
-        # Mapeia asset code para nome display
-        # EURUSD_otc -> EUR/USD (OTC), EURUSD -> EUR/USD
-        nome = asset.replace("_otc", "").upper()
-        # Insere / entre as moedas: EURUSD -> EUR/USD
-        if len(nome) == 6 and nome.isalpha():
-            nome = f"{nome[:3]}/{nome[3:]}"
-        # Adiciona (OTC) se _otc
-        if "_otc" in asset.lower():
-            nome_display = f"{nome} (OTC)"
-        else:
-            nome_display = nome
+        nome_display = _asset_para_display(asset)
 
         payout_data = payments.get(nome_display, {})
         payout_pct = payout_data.get("payment", 0)
@@ -1275,28 +1304,26 @@ class AgentQuotex:
 
     # --- Trade completo (buy + wait result) ---
     async def operar(self, asset: str, direction: str, amount: float,
-                     duration: int = 60) -> dict:
-        """Executa trade e aguarda resultado. Retorno completo.
+                     duration: int = 60) -> OpResult:
+        """Executa trade e aguarda resultado.
 
         Combina buy() + check_result() em uma unica chamada.
         """
         buy_result = await self.buy(asset, direction, amount, duration)
 
         if not buy_result["success"]:
-            return buy_result
-
-        trade_id = buy_result["trade_id"]
-        resultado = await self.check_result(trade_id)
+            return OpResult(
+                success=False,
+                erro=buy_result.get("erro", ""),
+                detalhes=buy_result.get("detalhes", ""),
+            )
 
-        return {
-            "success": True,
-            "asset": buy_result["asset"],
-            "direction": direction.lower(),
-            "amount": amount,
-            "duration": duration,
-            "result": resultado["result"],
-            "profit": resultado["profit"],
-        }
+        resultado = await self.check_result(buy_result["trade_id"])
+        return OpResult(
+            success=True,
+            profit=resultado["profit"],
+            result=resultado["result"],
+        )
 
     # --- Candles ---
     async def get_candles(self, asset: str, period: int = 60,
@@ -1411,12 +1438,11 @@ Exemplos:
 
     async def conectar(self) -> bool:
         """Conecta ao Telegram. Na primeira execucao pede codigo SMS."""
-        import asyncio
         from telethon import TelegramClient, events
 
         self.fila = asyncio.Queue()
 
-        session_path = str(Path(__file__).resolve().parent / "data" / "telegram_session")
+        session_path = str(_BASE_DIR / "data" / "telegram_session")
         self._client_telegram = TelegramClient(session_path, self.api_id, self.api_hash)
 
         # start() pede codigo SMS se necessario (interativo no terminal)
@@ -2,15 +2,16 @@
 cli.py - Menu interativo, historico e comandos de sessao.
 """
 
+import sys
 import json
 import asyncio
 from datetime import datetime
-from pathlib import Path
+from operator import itemgetter
 
 from agents import (
     AgentProtetor, AgentAnalisador, AgentVerificador, AgentQuotex,
 )
-from skills import skill_read_history
+from skills import skill_read_history, OPERATIONS_FILE
 from config import carregar_config, comando_config
 from utils import log_s
 from loops import (
@@ -37,6 +38,27 @@ _MENU = [
 ]
 
 
+# Bordas e linhas fixas do menu (largura total: 53 chars)
+_MENU_SEP_F = "  +" + "-" * 49 + "+"                     # borda completa
+_MENU_SEP_S = "  +" + "-" * 25 + "+" + "-" * 23 + "+"   # borda dividida
+_MENU_TITULO = f"  |{'TRADING SYSTEM QUOTEX':^49}|"
+_MENU_RODAPE = f"  |  {'[r]: Reinicia sistema':<22} | {'[0]: Encerra sistema':<22}|"
+
+
+def _fmt_item_menu(num: str, descricao: str) -> str:
+    """Formata uma linha de item do menu: |  [num] descricao  |"""
+    return f"  |  [{num}] {descricao:<43}|"
+
+
+# Linhas do _MENU pre-formatadas: (num, cmd, linha). "r" e "0" ficam no rodape.
+_MENU_LINHAS = tuple(
+    (num, cmd, f"  |  {'-- ' + cmd + ' --':<47}|") if num == "__section__"
+    else (num, cmd, _fmt_item_menu(num, descricao))
+    for num, cmd, descricao in _MENU
+    if num not in ("r", "0")
+)
+
+
 def comando_reiniciar(protetor: AgentProtetor):
     """Reinicia a sessao: zera contadores e desbloqueia. Nao altera configuracoes."""
     print()
@@ -49,23 +71,37 @@ def comando_reiniciar(protetor: AgentProtetor):
     print("  +--------------------------------------------------+")
     print()
 
-    resp = input("  Limpar historico de operacoes (operacoes.json)? (s/N): ").strip().lower()
+    resp = input("  Limpar historico de operacoes (operacoes.jsonl)? (s/N): ").strip().lower()
 
     protetor.forcar_desbloqueio()
     print("  [OK] Sessao reiniciada (contadores zerados)")
     log_s("INFO", "Sessao reiniciada manualmente (contadores zerados)")
 
     if resp == "s":
-        import json as _json
-        ops_file = Path(__file__).resolve().parent / "data" / "operacoes.json"
-        with open(ops_file, "w", encoding="utf-8") as f:
-            _json.dump([], f)
-        print("  [OK] Historico de operacoes limpo (operacoes.json)")
-        log_s("INFO", "Historico de operacoes limpo (operacoes.json)")
+        # Trunca (nao apaga): arquivo vazio = historico vazio, sem remigrar o legado
+        open(OPERATIONS_FILE, "w", encoding="utf-8").close()
+        print("  [OK] Historico de operacoes limpo (operacoes.jsonl)")
+        log_s("INFO", "Historico de operacoes limpo (operacoes.jsonl)")
 
     print()
 
 
+# Tabelas do historico: bordas/cabecalhos fixos e formatadores de linha
+# pre-vinculados (str.format: o layout e parseado uma vez, nao a cada linha)
+# Lista (largura total = 63 chars)
+_HIST_L_SEP       = "  +----+-------+------------------+------+------+-------------+"
+_HIST_L_SEPF      = "  +" + "=" * 59 + "+"
+_HIST_L_TITULO    = f"  |{'ULTIMAS OPERACOES REGISTRADAS':^59}|"
+_HIST_L_CABECALHO = f"  | {'#':<2} | {'Hora':<5} | {'Ativo':<16} | {'Dir':<4} | {'Res':<4} | {'Profit':<11} |"
+_HIST_L_LINHA     = "  | {:<2} | {:<5} | {:<16} | {:<4} | {:<4} | {:<11} |".format
+# Detalhe (largura total = 67 chars)
+_HIST_D_SEP       = "  +------+-------+----------+--------+------+-------+-------------+"
+_HIST_D_SEPF      = "  +" + "=" * 63 + "+"
+_HIST_D_TITULO    = f"  |{'DETALHE DA OPERACAO':^63}|"
+_HIST_D_CABECALHO = f"  | {'Niv':<4} | {'Hora':<5} | {'Valor':>8} | {'Payout':<6} | {'Dir':<4} | {'Res':<5} | {'Profit':<11} |"
+_HIST_D_LINHA     = "  | {:<4} | {:<5} | R${:>6.2f} | {:<6} | {:<4} | {:<5} | {:<11} |".format
+
+
 def comando_historico():
     """Exibe historico de operacoes agrupado por sequencia_id."""
     from datetime import datetime as _dt
@@ -104,13 +140,9 @@ def comando_historico():
             "timestamp": ts,
         })
 
-    sequencias.sort(key=lambda x: x["timestamp"], reverse=True)
+    sequencias.sort(key=itemgetter("timestamp"), reverse=True)
     sequencias = sequencias[:20]
 
-    # Separadores da lista (largura total = 63 chars)
-    L_SEP  = "  +----+-------+------------------+------+------+-------------+"
-    L_SEPF = "  +" + "=" * 59 + "+"
-
     def _exibir_lista():
         wins    = sum(1 for s in sequencias if s["res"] == "WIN")
         losses  = len(sequencias) - wins
@@ -118,25 +150,22 @@ def comando_historico():
         lucro_s = f"+R${lucro:.2f}" if lucro >= 0 else f"-R${abs(lucro):.2f}"
 
         print()
-        print(L_SEPF)
-        print(f"  |{'ULTIMAS OPERACOES REGISTRADAS':^59}|")
-        print(L_SEP)
-        print(f"  | {'#':<2} | {'Hora':<5} | {'Ativo':<16} | {'Dir':<4} | {'Res':<4} | {'Profit':<11} |")
-        print(L_SEP)
+        print(_HIST_L_SEPF)
+        print(_HIST_L_TITULO)
+        print(_HIST_L_SEP)
+        print(_HIST_L_CABECALHO)
+        print(_HIST_L_SEP)
         for i, seq in enumerate(sequencias, 1):
             p  = seq["profit"]
             ps = f"+R${p:.2f}" if p >= 0 else f"-R${abs(p):.2f}"
-            print(f"  | {i:<2} | {seq['hora']:<5} | {seq['ativo']:<16} | {seq['dir']:<4} | {seq['res']:<4} | {ps:<11} |")
-        print(L_SEP)
+            print(_HIST_L_LINHA(i, seq["hora"], seq["ativo"], seq["dir"], seq["res"], ps))
+        print(_HIST_L_SEP)
         rod = f" {len(sequencias)} entradas | Wins: {wins} | Losses: {losses} | Lucro: {lucro_s}"
         print(f"  |{rod:<59}|")
-        print(L_SEPF)
+        print(_HIST_L_SEPF)
         print()
 
     FONTE_MAP = {"quotex": "QUOTEX", "telegram": "TELEGRAM", "lista": "LISTA", "autonomo": "AUTONOMO"}
-    # Separadores do detalhe (largura total = 67 chars)
-    D_SEP  = "  +------+-------+----------+--------+------+-------+-------------+"
-    D_SEPF = "  +" + "=" * 63 + "+"
 
     def _exibir_detalhe(idx):
         seq   = sequencias[idx]
@@ -160,14 +189,14 @@ def comando_historico():
         lucro_s = f"+R$ {lucro_total:.2f}" if lucro_total >= 0 else f"-R$ {abs(lucro_total):.2f}"
 
         print()
-        print(D_SEPF)
-        print(f"  |{'DETALHE DA OPERACAO':^63}|")
+        print(_HIST_D_SEPF)
+        print(_HIST_D_TITULO)
         print(f"  | {'Loop: ' + fonte + '   |   Modo: ' + modo:<61} |")
         print(f"  | {'Ativo: ' + ativo + '   |   Duracao: ' + dur_s:<61} |")
         print(f"  | {'Cenario: ' + str(cenario) + '   |   Data: ' + data_s:<61} |")
-        print(D_SEP)
-        print(f"  | {'Niv':<4} | {'Hora':<5} | {'Valor':>8} | {'Payout':<6} | {'Dir':<4} | {'Res':<5} | {'Profit':<11} |")
-        print(D_SEP)
+        print(_HIST_D_SEP)
+        print(_HIST_D_CABECALHO)
+        print(_HIST_D_SEP)
         for op in ops_s:
             nivel    = (op.get("nivel_mg") or "entr")[:4]
             ts_op    = op.get("timestamp", "")
@@ -181,10 +210,10 @@ def comando_historico():
             profit_op = op.get("profit", 0)
             payout_s  = f"{round(profit_op / amount * 100)}%" if res_op.upper() == "WIN" and amount > 0 else "N/A"
             ps = f"+R${profit_op:.2f}" if profit_op >= 0 else f"-R${abs(profit_op):.2f}"
-            print(f"  | {nivel:<4} | {hora_op:<5} | R${amount:>6.2f} | {payout_s:<6} | {dir_op:<4} | {res_op:<5} | {ps:<11} |")
-        print(D_SEP)
+            print(_HIST_D_LINHA(nivel, hora_op, amount, payout_s, dir_op, res_op, ps))
+        print(_HIST_D_SEP)
         print(f"  | {f'Lucro da sequencia: {lucro_s}':<61} |")
-        print(D_SEPF)
+        print(_HIST_D_SEPF)
         print()
 
     while True:
@@ -219,34 +248,26 @@ def _exibir_menu(cfg: dict, protetor: "AgentProtetor" = None):
     def _linha(lbl1, val1, lbl2, val2):
         esq  = f"  {lbl1:<7}: {val1:<12}  "  # 25 chars
         dir_ = f"  {lbl2:<7}: {val2:<10}  "  # 23 chars
-        print(f"  |{esq}|{dir_}|")
-
-    SEP_F = "  +" + "-" * 49 + "+"          # borda completa
-    SEP_S = "  +" + "-" * 25 + "+" + "-" * 23 + "+"  # borda dividida
-
-    print()
-    print(SEP_F)
-    print(f"  |{'TRADING SYSTEM QUOTEX':^49}|")
-    print(SEP_S)
-    _linha("Modo",    modo,    "Mercado",  mercado)
-    _linha("MaxOps",  maxops,  "Ativos",   ativo)
-    _linha("SL -R$",  sl_r,    "Pay min",  pay)
-    _linha("TP +R$",  tp,      "Niv MG",   niveis)
-    print(SEP_F)
-    for num, cmd, descricao in _MENU:
-        if num == "__section__":
-            print(f"  |  {'-- ' + cmd + ' --':<47}|")
-            continue
-        if num in ("r", "0"):
-            continue
+        return f"  |{esq}|{dir_}|"
+
+    linhas = [
+        "",
+        _MENU_SEP_F,
+        _MENU_TITULO,
+        _MENU_SEP_S,
+        _linha("Modo",    modo,    "Mercado",  mercado),
+        _linha("MaxOps",  maxops,  "Ativos",   ativo),
+        _linha("SL -R$",  sl_r,    "Pay min",  pay),
+        _linha("TP +R$",  tp,      "Niv MG",   niveis),
+        _MENU_SEP_F,
+    ]
+    for num, cmd, linha in _MENU_LINHAS:
         if cmd == "status" and protetor is not None:
             est = "BLOQUEADO" if protetor.bloqueado else "LIVRE"
-            descricao = f"STATUS ATUAL [{est}]"
-        print(f"  |  [{num}] {descricao:<43}|")
-    print(SEP_F)
-    print(f"  |  {'[r]: Reinicia sistema':<22} | {'[0]: Encerra sistema':<22}|")
-    print(SEP_F)
-    print()
+            linha = _fmt_item_menu(num, f"STATUS ATUAL [{est}]")
+        linhas.append(linha)
+    linhas += [_MENU_SEP_F, _MENU_RODAPE, _MENU_SEP_F, ""]
+    sys.stdout.write("\n".join(linhas) + "\n")
 
 
 def modo_manual(protetor: AgentProtetor, analisador: AgentAnalisador, verificador: AgentVerificador):
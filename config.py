@@ -9,9 +9,19 @@ from pathlib import Path
 
 from dotenv import dotenv_values
 
+try:
+    import orjson  # opcional: parse JSON em C (mais rapido)
+except ImportError:
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
 from utils import log_s
 
-CONFIG_FILE = Path(__file__).resolve().parent / "data" / "config.json"
+# Diretorio do projeto (resolvido uma vez no import)
+_BASE_DIR = Path(__file__).resolve().parent
+
+CONFIG_FILE = _BASE_DIR / "data" / "config.json"
 
 _CONFIG_DEFAULTS = {
     # Conta
@@ -47,6 +57,8 @@ _CONFIG_DEFAULTS = {
     # Horario de operacao (vazio = sem restricao)
     "horario_inicio": "",
     "horario_fim": "",
+    # Exibicao: INFO = linha por candle no loop autonomo | QUIET = so sinais
+    "log_level": "INFO",
 }
 
 # Cache mtime: evita releitura desnecessaria do disco
@@ -61,8 +73,7 @@ def carregar_config() -> dict:
         mtime = CONFIG_FILE.stat().st_mtime
         if _cfg_cache is not None and mtime == _cfg_mtime:
             return dict(_cfg_cache)  # copia para evitar mutacao do cache
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            cfg = json.load(f)
+        cfg = _loads(CONFIG_FILE.read_bytes())
         for k, v in _CONFIG_DEFAULTS.items():
             cfg.setdefault(k, v)
         _cfg_cache = cfg
@@ -80,7 +91,7 @@ def salvar_config(cfg: dict):
 
 def _atualizar_env_multiplo(updates: dict):
     """Atualiza multiplas variaveis no arquivo .env (cria a linha se nao existir)."""
-    env_path = Path(__file__).resolve().parent / ".env"
+    env_path = _BASE_DIR / ".env"
     try:
         try:
             with open(env_path, "r", encoding="utf-8") as f:
@@ -107,7 +118,7 @@ def comando_config(protetor: "AgentProtetor" = None):
     """Menu interativo para editar configuracoes organizadas por categoria."""
     cfg = carregar_config()
 
-    env_path = Path(__file__).resolve().parent / ".env"
+    env_path = _BASE_DIR / ".env"
     try:
         from dotenv import dotenv_values as _dv
         env_cfg = dict(_dv(env_path))
@@ -131,6 +142,7 @@ def comando_config(protetor: "AgentProtetor" = None):
         ("timeout_resultado_seg",       "Timeout resultado (seg)",     "int"),
         ("timeout_conexao_seg",         "Timeout conexao (seg)",       "int"),
         ("tentativas_reconexao",        "Tentativas reconexao",        "int"),
+        ("log_level",                   "Log do loop autonomo",        "choice:INFO:QUIET"),
     ]
 
     _FILTROS_CAMPOS = [
@@ -299,7 +311,7 @@ def comando_config(protetor: "AgentProtetor" = None):
                     print(f"  Telefone: {tg.phone}")
                     print(f"  Bot:      {tg.bot_username}")
                     print(f"  Offset:   {tg.time_offset} min")
-                    sessao = Path(__file__).resolve().parent / "data" / "telegram_session.session"
+                    sessao = _BASE_DIR / "data" / "telegram_session.session"
                     print(f"  Sessao:   {'salva' if sessao.exists() else 'nao encontrada'}")
                     print(f"  +--------------------------------------------------+\n")
                     await tg.desconectar()
@@ -536,7 +548,7 @@ def comando_config(protetor: "AgentProtetor" = None):
             extra = None
             if entry[1] == "TELEGRAM":
                 def _resetar_sessao_telegram():
-                    sessao = Path(__file__).resolve().parent / "data" / "telegram_session.session"
+                    sessao = _BASE_DIR / "data" / "telegram_session.session"
                     if sessao.exists():
                         sessao.unlink()
                         print("  [OK] Sessao Telegram resetada. Sera pedido novo codigo SMS na proxima conexao.\n")
@@ -546,7 +558,7 @@ def comando_config(protetor: "AgentProtetor" = None):
                 extra = {"r": ("resetar sessao", _resetar_sessao_telegram)}
             elif entry[1] == "CONEXAO QUOTEX":
                 def _resetar_sessao_quotex():
-                    sessao = Path(__file__).resolve().parent / "session.json"
+                    sessao = _BASE_DIR / "session.json"
                     if sessao.exists():
                         sessao.unlink()
                         print("  [OK] Sessao Quotex resetada. Novo login sera feito na proxima conexao.\n")
@@ -2,11 +2,13 @@
 loops.py - Loops de execucao e helpers de conexao/timing.
 """
 
+import sys
 import json
 import math
 import time
 import asyncio
 from datetime import datetime
+from operator import itemgetter
 from pathlib import Path
 
 from agents import (
@@ -14,23 +16,30 @@ from agents import (
     AgentQuotex, AgentTelegram,
 )
 from skills import (
-    skill_calculate_mg, skill_register_operation,
-    skill_log_alert,
+    skill_calculate_mg, skill_register_operations,
+    skill_log_alert, _flush_alerts,
 )
 from config import carregar_config, salvar_config
 from utils import (
     log_s, _inp, _shutdown_gracioso,
     _instalar_shutdown_gracioso, _restaurar_shutdown,
-    _sleep_cancelavel, _verificar_internet,
-    _classificar_ativo, _esta_no_horario,
+    _sleep_cancelavel, _verificar_internet_async,
+    _classificar_ativo, _esta_no_horario, _hora_atual,
 )
 
+# Diretorio do projeto (resolvido uma vez no import)
+_BASE_DIR = Path(__file__).resolve().parent
+
 # --- Constantes operacionais ---
 _TIMEOUT_CANDLES_SEG   = 30   # timeout para buscar historico de candles
 _FATOR_CANDLES_HIST    = 100  # quantos candles buscar (duracao x fator)
 _ESPERA_RETRY_REDE_SEG = 30   # espera antes de retry em erro de rede
 _TOP_ATIVOS_EXIBIR     = 5    # numero de ativos alternativos a exibir
 
+# --- Separadores de banner (montados uma vez, reusados a cada sequencia/sinal) ---
+_SEP_EQ   = "=" * 55
+_SEP_HASH = "#" * 55
+
 
 async def _conectar_com_retry(quotex: "AgentQuotex", cfg: dict) -> bool:
     """Conecta na Quotex com timeout e multiplas tentativas.
@@ -128,10 +137,43 @@ def _listar_ativos_quotex(quotex: "AgentQuotex", cfg: dict) -> list[dict]:
             "mercado": mercado,
         })
 
-    ativos.sort(key=lambda x: x["payout_pct"], reverse=True)
+    ativos.sort(key=itemgetter("payout_pct"), reverse=True)
     return ativos
 
 
+async def _analisar_e_saldo(analisador: "AgentAnalisador", quotex: "AgentQuotex") -> tuple[dict, dict]:
+    """Roda a analise local (disco, em thread) e o get_saldo (websocket) em paralelo.
+
+    Usa gather e nao TaskGroup: uma falha chega como a excecao original
+    (TaskGroup embrulha em ExceptionGroup e o log perde o erro real).
+    """
+    return await asyncio.gather(asyncio.to_thread(analisador.analisar), quotex.get_saldo())
+
+
+async def _flush_log_worker(fila: asyncio.Queue) -> None:
+    """Grava operacoes enfileiradas em background, agrupando em lotes.
+
+    Aguarda a primeira operacao, drena o que mais estiver na fila e grava
+    tudo numa so chamada (em thread, para nao travar o event loop).
+    """
+    while True:
+        lote = [await fila.get()]
+        while True:
+            try:
+                lote.append(fila.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            res = await asyncio.to_thread(skill_register_operations, lote)
+            if not res.get("success"):
+                log_s("WARN", f"Falha ao registrar {len(lote)} operacao(oes): {res.get('erro')}")
+        except Exception as e:
+            log_s("WARN", f"Falha ao registrar {len(lote)} operacao(oes): {e}")
+        finally:
+            for _ in lote:
+                fila.task_done()
+
+
 async def _executar_ciclo_mg(
     quotex,
     asset_real: str,
@@ -154,7 +196,10 @@ async def _executar_ciclo_mg(
 
     aguardar_candle=True: aguarda abertura do proximo candle antes do nivel 0 (loop quotex).
     horario_sinal: se None, aguarda candle antes do nivel 0 (telegram/lista sem horario fixo).
-    extra_fields: campos extras para skill_register_operation (ex: estrategia no loop autonomo).
+    extra_fields: campos extras para skill_register_operations (ex: estrategia no loop autonomo).
+
+    As operacoes sao gravadas por um flusher em background; o ciclo aguarda
+    a fila esvaziar antes de retornar (historico consistente para o protetor).
     """
     fator_correcao = (1.0 / payout) if cfg.get("fator_correcao_mg") and payout > 0 else 1.0
     mg = skill_calculate_mg(entrada=valor, payout=payout, nivel=niveis, fator_correcao=fator_correcao)
@@ -171,74 +216,94 @@ async def _executar_ciclo_mg(
     lucro_seq = 0.0
     teve_loss = False  # rastreia se houve LOSS antes de qualquer break inesperado
 
-    for i, nivel_info in enumerate(mg["niveis"]):
-        nivel_nome = "entrada" if i == 0 else f"mg{i}"
-        valor_op = nivel_info["valor"]
+    fila_log: asyncio.Queue = asyncio.Queue()
+    flusher = asyncio.create_task(_flush_log_worker(fila_log))
+    try:
+        for i, nivel_info in enumerate(mg["niveis"]):
+            nivel_nome = "entrada" if i == 0 else f"mg{i}"
+            valor_op = nivel_info["valor"]
 
-        if i == 0:
-            if aguardar_candle or horario_sinal is None:
-                await aguardar_proximo_intervalo(duracao)
-        else:
-            print(f"\n    [MG] Entrada imediata: {datetime.now().strftime('%H:%M:%S')}")
+            if i == 0:
+                if aguardar_candle or horario_sinal is None:
+                    await aguardar_proximo_intervalo(duracao)
+            else:
+                print(f"\n    [MG] Entrada imediata: {_hora_atual()}")
+
+            print(f"\n    {nivel_info['nivel'].upper()}: R${valor_op} -> {asset_real} {direction.upper()} ({duracao}s)")
+
+            timeout_res = int(cfg.get("timeout_resultado_seg", 900))
+            try:
+                result = await asyncio.wait_for(
+                    quotex.operar(asset=asset_real, direction=direction,
+                                  amount=valor_op, duration=duracao),
+                    timeout=timeout_res,
+                )
+            except asyncio.TimeoutError:
+                print(f"    [TIMEOUT] Resultado nao recebido em {timeout_res}s")
+                if await _reconectar(quotex, cfg):
+                    print(f"    [RECONEXAO OK] Pulando nivel atual")
+                cenario_final = 3  # resultado desconhecido — assume C3 (conservador)
+                break
+            except Exception as e:
+                print(f"    [ERRO CONEXAO] {e}")
+                if await _reconectar(quotex, cfg):
+                    print(f"    [RECONEXAO OK] Pulando nivel atual")
+                cenario_final = 3  # resultado desconhecido — assume C3 (conservador)
+                break
+
+            if not result.success:
+                det = result.detalhes
+                print(f"    [ERRO] {result.erro or 'Falha'}" + (f": {det}" if det else ""))
+                break
 
-        print(f"\n    {nivel_info['nivel'].upper()}: R${valor_op} -> {asset_real} {direction.upper()} ({duracao}s)")
+            profit = result.profit
+            lucro_seq += profit
 
-        timeout_res = int(cfg.get("timeout_resultado_seg", 900))
+            if result.result == "WIN":
+                print(f"    >>> WIN! +R${profit} <<<")
+                cenario_final = 1 if i == 0 else 2
+            elif result.result == "DOJI":
+                print(f"    >>> DOJI (empate) - entrada devolvida <<<")
+                cenario_final = 0
+            else:
+                print(f"    >>> LOSS R${profit} <<<")
+                teve_loss = True
+                if i == len(mg["niveis"]) - 1:
+                    cenario_final = 3
+
+            op = {
+                "asset": asset_real, "direction": direction,
+                "amount": valor_op, "result": result.result,
+                "profit": profit, "timestamp": datetime.now().isoformat(),
+                "cenario": cenario_final, "nivel_mg": nivel_nome,
+                "sequencia_id": seq_id,
+                "fonte": fonte,
+                "modo": quotex.account_mode,
+                "duracao": duracao,
+            }
+            if extra_fields:
+                op.update(extra_fields)
+            fila_log.put_nowait(op)
+
+            if result.result in ("WIN", "DOJI"):
+                break
+    finally:
         try:
-            result = await asyncio.wait_for(
-                quotex.operar(asset=asset_real, direction=direction,
-                              amount=valor_op, duration=duracao),
-                timeout=timeout_res,
-            )
-        except asyncio.TimeoutError:
-            print(f"    [TIMEOUT] Resultado nao recebido em {timeout_res}s")
-            if await _reconectar(quotex, cfg):
-                print(f"    [RECONEXAO OK] Pulando nivel atual")
-            cenario_final = 3  # resultado desconhecido — assume C3 (conservador)
-            break
-        except Exception as e:
-            print(f"    [ERRO CONEXAO] {e}")
-            if await _reconectar(quotex, cfg):
-                print(f"    [RECONEXAO OK] Pulando nivel atual")
-            cenario_final = 3  # resultado desconhecido — assume C3 (conservador)
-            break
-
-        if not result["success"]:
-            det = result.get("detalhes", "")
-            print(f"    [ERRO] {result.get('erro', 'Falha')}" + (f": {det}" if det else ""))
-            break
-
-        profit = result["profit"]
-        lucro_seq += profit
-
-        if result["result"] == "WIN":
-            print(f"    >>> WIN! +R${profit} <<<")
-            cenario_final = 1 if i == 0 else 2
-        elif result["result"] == "DOJI":
-            print(f"    >>> DOJI (empate) - entrada devolvida <<<")
-            cenario_final = 0
-        else:
-            print(f"    >>> LOSS R${profit} <<<")
-            teve_loss = True
-            if i == len(mg["niveis"]) - 1:
-                cenario_final = 3
-
-        op = {
-            "asset": asset_real, "direction": direction,
-            "amount": valor_op, "result": result["result"],
-            "profit": profit, "timestamp": datetime.now().isoformat(),
-            "cenario": cenario_final, "nivel_mg": nivel_nome,
-            "sequencia_id": seq_id,
-            "fonte": fonte,
-            "modo": quotex.account_mode,
-            "duracao": duracao,
-        }
-        if extra_fields:
-            op.update(extra_fields)
-        skill_register_operation(op)
-
-        if result["result"] in ("WIN", "DOJI"):
-            break
+            await asyncio.shield(fila_log.join())
+        except asyncio.CancelledError:
+            # Ciclo cancelado durante a espera: grava aqui o que ainda estava na fila
+            restantes = []
+            while not fila_log.empty():
+                restantes.append(fila_log.get_nowait())
+                fila_log.task_done()
+            if restantes:
+                res = skill_register_operations(restantes)
+                if not res.get("success"):
+                    log_s("WARN", f"Falha ao registrar {len(restantes)} operacao(oes): {res.get('erro')}")
+            raise
+        finally:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
 
     return {"cenario": cenario_final, "lucro": lucro_seq}
 
@@ -372,14 +437,16 @@ async def _loop_quotex_async(protetor: AgentProtetor, analisador: AgentAnalisado
     payout = payout_info["payout"]
     payout_inicial = payout  # referencia para detectar mudancas durante a sessao
 
-    print()
-    print("=" * 55)
-    print(f"  QUOTEX - OPERACAO REAL ({quotex.account_mode})")
-    print(f"  {asset_real} | {direction} | R${valor} | {duracao}s")
-    print(f"  Payout: {payout_info['payout_pct']}% | {niveis} niveis MG")
-    print(f"  Ctrl+C para parar")
-    print("=" * 55)
-    print()
+    sys.stdout.write("\n".join([
+        "",
+        _SEP_EQ,
+        f"  QUOTEX - OPERACAO REAL ({quotex.account_mode})",
+        f"  {asset_real} | {direction} | R${valor} | {duracao}s",
+        f"  Payout: {payout_info['payout_pct']}% | {niveis} niveis MG",
+        "  Ctrl+C para parar",
+        _SEP_EQ,
+        "",
+    ]) + "\n")
 
     seq_num = 0
     cenarios_3_session = 0
@@ -389,15 +456,17 @@ async def _loop_quotex_async(protetor: AgentProtetor, analisador: AgentAnalisado
     try:
         while seq_num < max_ops and not _shutdown_gracioso.is_set():
             seq_num += 1
-            hora = datetime.now().strftime("%H:%M:%S")
+            hora = _hora_atual()
 
-            print(f"\n{'#' * 55}")
-            print(f"  [{hora}] SEQUENCIA {seq_num}/{max_ops} - QUOTEX {quotex.account_mode}")
-            print(f"{'#' * 55}")
+            sys.stdout.write(
+                f"\n{_SEP_HASH}\n"
+                f"  [{hora}] SEQUENCIA {seq_num}/{max_ops} - QUOTEX {quotex.account_mode}\n"
+                f"{_SEP_HASH}\n"
+            )
 
             # --- PROTETOR ---
             print(f"\n  [PROTETOR] Verificando...")
-            pre = protetor.verificar()
+            pre = await asyncio.to_thread(protetor.verificar)
             if not pre["pode_continuar"]:
                 print(f"  *** BLOQUEADO: {pre.get('motivo_bloqueio')} ***")
                 log_s("WARN", f"Protetor bloqueou loop QUOTEX: {pre.get('motivo_bloqueio')}")
@@ -441,12 +510,11 @@ async def _loop_quotex_async(protetor: AgentProtetor, analisador: AgentAnalisado
             log_s("INFO", f"Ciclo QUOTEX | {asset_real} | {direction.upper()} | C{cenario_final} | R${round(lucro_seq,2)}")
 
             # --- ANALISADOR ---
-            analise = analisador.analisar()
+            analise, saldo_real = await _analisar_e_saldo(analisador, quotex)
             rec = analise["recomendacao"]
             met = analise["metricas"]
 
             # Saldo real da Quotex - sincroniza protetor
-            saldo_real = await quotex.get_saldo()
             protetor.sincronizar_saldo(saldo_real['saldo'])
             print(f"\n  Saldo Quotex: R${saldo_real['saldo']} | Taxa: {met['taxa_acerto']}% | Acao: {rec['acao']}")
 
@@ -467,13 +535,12 @@ async def _loop_quotex_async(protetor: AgentProtetor, analisador: AgentAnalisado
         print(f"\n\n  [!] Saida imediata")
     finally:
         _restaurar_shutdown(handler_orig)
+        _flush_alerts()
         if _shutdown_gracioso.is_set():
             print(f"\n  [!] Encerrado apos operacao registrada.")
 
     # Relatorio final
-    print(f"\n{'=' * 55}")
-    print(f"  RELATORIO FINAL - QUOTEX {quotex.account_mode}")
-    print(f"{'=' * 55}\n")
+    sys.stdout.write(f"\n{_SEP_EQ}\n  RELATORIO FINAL - QUOTEX {quotex.account_mode}\n{_SEP_EQ}\n\n")
     analisador.gerar_relatorio(salvar=True, imprimir=True)
 
     try:
@@ -482,9 +549,11 @@ async def _loop_quotex_async(protetor: AgentProtetor, analisador: AgentAnalisado
     except Exception:
         pass
 
-    print(f"  Sequencias: {seq_num} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}")
-    print(f"  [Salvo em relatorio.txt]")
-    print(f"{'=' * 55}\n")
+    sys.stdout.write("\n".join([
+        f"  Sequencias: {seq_num} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}",
+        "  [Salvo em relatorio.txt]",
+        f"{_SEP_EQ}\n",
+    ]) + "\n")
     log_s("INFO", f"Loop QUOTEX encerrado | Sequencias: {seq_num} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}")
 
     await quotex.desconectar()
@@ -566,14 +635,14 @@ async def _loop_telegram_async(protetor: AgentProtetor, analisador: AgentAnalisa
     handler_orig = _instalar_shutdown_gracioso()
     try:
         while not _shutdown_gracioso.is_set():
-            hora = datetime.now().strftime("%H:%M:%S")
+            hora = _hora_atual()
             print(f"  [{hora}] Aguardando sinal na fila...", end="\r")
 
             sinal = await telegram.proximo_sinal()
 
-            print(f"\n  {'#' * 55}")
+            print(f"\n  {_SEP_HASH}")
             print(f"  SINAL: {sinal['ativo']} {sinal['direcao'].upper()} {sinal['duracao']}s")
-            print(f"  {'#' * 55}")
+            print(f"  {_SEP_HASH}")
 
             # --- Filtros do config (recarrega a cada sinal) ---
             cfg_atual = carregar_config()
@@ -604,7 +673,7 @@ async def _loop_telegram_async(protetor: AgentProtetor, analisador: AgentAnalisa
                     continue  # sinal atrasado, descarta
 
             # --- Protetor ---
-            pre = protetor.verificar()
+            pre = await asyncio.to_thread(protetor.verificar)
             if not pre["pode_continuar"]:
                 print(f"  *** BLOQUEADO: {pre.get('motivo_bloqueio')} ***")
                 log_s("WARN", f"Protetor bloqueou loop TELEGRAM: {pre.get('motivo_bloqueio')}")
@@ -668,11 +737,10 @@ async def _loop_telegram_async(protetor: AgentProtetor, analisador: AgentAnalisa
             log_s("INFO", f"Ciclo TELEGRAM | {asset_real} | {direcao.upper()} | C{cenario_final} | R${round(lucro_seq,2)}")
 
             # --- Analisador ---
-            analise = analisador.analisar()
+            analise, saldo_real = await _analisar_e_saldo(analisador, quotex)
             rec = analise["recomendacao"]
             met = analise["metricas"]
 
-            saldo_real = await quotex.get_saldo()
             protetor.sincronizar_saldo(saldo_real['saldo'])
             print(f"  Saldo: R${saldo_real['saldo']} | Taxa: {met['taxa_acerto']}% | Acao: {rec['acao']}")
             print(f"  Sinais na fila: {telegram.sinais_pendentes()}")
@@ -689,20 +757,21 @@ async def _loop_telegram_async(protetor: AgentProtetor, analisador: AgentAnalisa
         print(f"\n\n  [!] Saida imediata")
     finally:
         _restaurar_shutdown(handler_orig)
+        _flush_alerts()
         if _shutdown_gracioso.is_set():
             print(f"\n  [!] Encerrado apos operacao registrada.")
 
     escuta_task.cancel()
 
     # Relatorio final
-    print(f"\n{'=' * 55}")
-    print(f"  RELATORIO FINAL - MODO TELEGRAM")
-    print(f"{'=' * 55}\n")
+    sys.stdout.write(f"\n{_SEP_EQ}\n  RELATORIO FINAL - MODO TELEGRAM\n{_SEP_EQ}\n\n")
     analisador.gerar_relatorio(salvar=True, imprimir=True)
-    print(f"\n  Ops executadas: {ops_executadas} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}")
-    print(f"  {telegram.status()}")
-    print(f"  [Salvo em relatorio.txt]")
-    print(f"{'=' * 55}\n")
+    sys.stdout.write("\n".join([
+        f"\n  Ops executadas: {ops_executadas} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}",
+        f"  {telegram.status()}",
+        "  [Salvo em relatorio.txt]",
+        f"{_SEP_EQ}\n",
+    ]) + "\n")
     log_s("INFO", f"Loop TELEGRAM encerrado | Ops: {ops_executadas} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}")
 
     await telegram.desconectar()
@@ -729,7 +798,7 @@ async def _loop_lista_async(protetor: AgentProtetor, analisador: AgentAnalisador
     if cancel: return
     arquivo = Path(v)
     if not arquivo.is_absolute():
-        arquivo = Path(__file__).resolve().parent / arquivo
+        arquivo = _BASE_DIR / arquivo
 
     if not arquivo.exists():
         print(f"\n  [ERRO] Arquivo nao encontrado: {arquivo}")
@@ -796,12 +865,14 @@ async def _loop_lista_async(protetor: AgentProtetor, analisador: AgentAnalisador
         await quotex.desconectar()
         return
 
-    print()
-    print("=" * 55)
-    print(f"  LOOP LISTA - {len(sinais)} sinais ({quotex.account_mode})")
-    print(f"  Ctrl+C para parar")
-    print("=" * 55)
-    print()
+    sys.stdout.write("\n".join([
+        "",
+        _SEP_EQ,
+        f"  LOOP LISTA - {len(sinais)} sinais ({quotex.account_mode})",
+        "  Ctrl+C para parar",
+        _SEP_EQ,
+        "",
+    ]) + "\n")
     log_s("INFO", f"Loop LISTA iniciado | {len(sinais)} sinais | Modo: {quotex.account_mode}")
 
     lucro_session = 0.0
@@ -814,10 +885,12 @@ async def _loop_lista_async(protetor: AgentProtetor, analisador: AgentAnalisador
             if _shutdown_gracioso.is_set():
                 break
 
-            hora = datetime.now().strftime("%H:%M:%S")
-            print(f"\n{'#' * 55}")
-            print(f"  [{hora}] SINAL {ops_executadas + 1}/{len(sinais)}: {sinal['ativo']} {sinal['direcao'].upper()} {sinal.get('horario', 'imediato')}")
-            print(f"{'#' * 55}")
+            hora = _hora_atual()
+            sys.stdout.write(
+                f"\n{_SEP_HASH}\n"
+                f"  [{hora}] SINAL {ops_executadas + 1}/{len(sinais)}: {sinal['ativo']} {sinal['direcao'].upper()} {sinal.get('horario', 'imediato')}\n"
+                f"{_SEP_HASH}\n"
+            )
 
             # Recarrega config a cada sinal
             cfg_atual = carregar_config()
@@ -847,7 +920,7 @@ async def _loop_lista_async(protetor: AgentProtetor, analisador: AgentAnalisador
                     continue  # sinal atrasado, descarta
 
             # Protetor
-            pre = protetor.verificar()
+            pre = await asyncio.to_thread(protetor.verificar)
             if not pre["pode_continuar"]:
                 print(f"  *** BLOQUEADO: {pre.get('motivo_bloqueio')} ***")
                 log_s("WARN", f"Protetor bloqueou loop LISTA: {pre.get('motivo_bloqueio')}")
@@ -907,11 +980,10 @@ async def _loop_lista_async(protetor: AgentProtetor, analisador: AgentAnalisador
             print(f"\n  -> {labels.get(cenario_final, '?')} | R${round(lucro_seq, 2)}")
             log_s("INFO", f"Ciclo LISTA | {asset_real} | {direcao.upper()} | C{cenario_final} | R${round(lucro_seq,2)}")
 
-            analise = analisador.analisar()
+            analise, saldo_real = await _analisar_e_saldo(analisador, quotex)
             rec = analise["recomendacao"]
             met = analise["metricas"]
 
-            saldo_real = await quotex.get_saldo()
             protetor.sincronizar_saldo(saldo_real['saldo'])
             print(f"  Saldo: R${saldo_real['saldo']} | Taxa: {met['taxa_acerto']}% | Sinais restantes: {len(sinais) - ops_executadas}")
 
@@ -927,17 +999,18 @@ async def _loop_lista_async(protetor: AgentProtetor, analisador: AgentAnalisador
         print(f"\n\n  [!] Saida imediata")
     finally:
         _restaurar_shutdown(handler_orig)
+        _flush_alerts()
         if _shutdown_gracioso.is_set():
             print(f"\n  [!] Encerrado apos operacao registrada.")
 
     # Relatorio final
-    print(f"\n{'=' * 55}")
-    print(f"  RELATORIO FINAL - MODO LISTA")
-    print(f"{'=' * 55}\n")
+    sys.stdout.write(f"\n{_SEP_EQ}\n  RELATORIO FINAL - MODO LISTA\n{_SEP_EQ}\n\n")
     analisador.gerar_relatorio(salvar=True, imprimir=True)
-    print(f"\n  Executados: {ops_executadas}/{len(sinais)} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}")
-    print(f"  [Salvo em relatorio.txt]")
-    print(f"{'=' * 55}\n")
+    sys.stdout.write("\n".join([
+        f"\n  Executados: {ops_executadas}/{len(sinais)} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}",
+        "  [Salvo em relatorio.txt]",
+        f"{_SEP_EQ}\n",
+    ]) + "\n")
     log_s("INFO", f"Loop LISTA encerrado | Executados: {ops_executadas}/{len(sinais)} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}")
 
     await quotex.desconectar()
@@ -1133,14 +1206,16 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
     payout_info = quotex.get_payout(asset)
     payout = payout_info["payout"]
 
-    print()
-    print("=" * 55)
-    print(f"  LOOP AUTONOMO ({quotex.account_mode})")
-    print(f"  {asset_real} | {duracao}s | Estrategia: {estrategia_nome}")
-    print(f"  Payout: {payout_info['payout_pct']}% | MG {niveis} niveis | R${valor}")
-    print(f"  Ctrl+C para parar")
-    print("=" * 55)
-    print()
+    sys.stdout.write("\n".join([
+        "",
+        _SEP_EQ,
+        f"  LOOP AUTONOMO ({quotex.account_mode})",
+        f"  {asset_real} | {duracao}s | Estrategia: {estrategia_nome}",
+        f"  Payout: {payout_info['payout_pct']}% | MG {niveis} niveis | R${valor}",
+        f"  Ctrl+C para parar",
+        _SEP_EQ,
+        "",
+    ]) + "\n")
     log_s("INFO", f"Loop AUTONOMO iniciado | {asset_real} | {estrategia_nome} | {duracao}s | Modo: {quotex.account_mode}")
 
     lucro_session = 0.0
@@ -1149,13 +1224,15 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
     candles_analisados = 0
     _timeouts_candle_consecutivos = 0
     _MAX_TIMEOUTS_CANDLE = 3  # reconecta apos N timeouts seguidos
+    pre = None  # ultimo diagnostico do protetor (so muda apos uma operacao)
 
     handler_orig = _instalar_shutdown_gracioso()
     try:
         while not _shutdown_gracioso.is_set():
 
-            # Protetor antes de aguardar candle
-            pre = protetor.verificar()
+            # Protetor antes de aguardar candle (reverifica so apos operar)
+            if pre is None:
+                pre = await asyncio.to_thread(protetor.verificar)
             if not pre["pode_continuar"]:
                 print(f"\n  *** BLOQUEADO: {pre.get('motivo_bloqueio')} ***")
                 log_s("WARN", f"Protetor bloqueou loop AUTONOMO: {pre.get('motivo_bloqueio')}")
@@ -1170,7 +1247,7 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
             if _shutdown_gracioso.is_set():
                 break
 
-            hora = datetime.now().strftime("%H:%M:%S")
+            hora = _hora_atual()
             candles_analisados += 1
             cfg_atual = carregar_config()
 
@@ -1183,7 +1260,7 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
                 _timeouts_candle_consecutivos = 0  # reset ao receber candles
                 if not candles:
                     print(f"  [{hora}] Sem dados de candle.", end=" ", flush=True)
-                    ok, ms = _verificar_internet()
+                    ok, ms = await _verificar_internet_async()
                     if ok:
                         print(f"Rede OK ({ms:.0f}ms) — aguardando proximo intervalo.")
                     else:
@@ -1194,7 +1271,7 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
             except asyncio.TimeoutError:
                 _timeouts_candle_consecutivos += 1
                 print(f"  [{hora}] [TIMEOUT] get_candles nao respondeu em {_TIMEOUT_CANDLES_SEG}s.", end=" ", flush=True)
-                ok, ms = _verificar_internet()
+                ok, ms = await _verificar_internet_async()
                 if ok:
                     print(f"Rede OK ({ms:.0f}ms) — possivel instabilidade no servidor.")
                 else:
@@ -1210,7 +1287,7 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
                 continue
             except Exception as e:
                 print(f"  [{hora}] [ERRO] Buscando candles: {e}")
-                ok, _ = _verificar_internet()
+                ok, _ = await _verificar_internet_async()
                 if not ok:
                     print(f"  [{hora}] [REDE] Sem internet. Aguardando {_ESPERA_RETRY_REDE_SEG}s...")
                     await asyncio.sleep(_ESPERA_RETRY_REDE_SEG)
@@ -1222,21 +1299,23 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
             motivo = resultado.get("motivo", "")
             indicadores = resultado.get("indicadores", {})
 
-            ind_str = " | ".join(f"{k}={v}" for k, v in indicadores.items()) if indicadores else ""
-
             if not sinal:
-                status = f"  [{hora}] Sem sinal - {motivo}"
-                if ind_str:
-                    status += f" | {ind_str}"
-                print(status)
+                # log_level QUIET: nao formata nem imprime a linha por candle
+                if cfg_atual.get("log_level", "INFO") != "QUIET":
+                    status = f"  [{hora}] Sem sinal - {motivo}"
+                    if indicadores:
+                        status += " | " + " | ".join(f"{k}={v}" for k, v in indicadores.items())
+                    print(status)
                 continue
 
+            ind_str = " | ".join(f"{k}={v}" for k, v in indicadores.items()) if indicadores else ""
+
             # Sinal gerado — exibe destaque
-            print(f"\n{'#' * 55}")
-            print(f"  [{hora}] SINAL: {sinal.upper()} | {motivo}")
+            banner = [f"\n{_SEP_HASH}", f"  [{hora}] SINAL: {sinal.upper()} | {motivo}"]
             if ind_str:
-                print(f"  Indicadores: {ind_str}")
-            print(f"{'#' * 55}")
+                banner.append(f"  Indicadores: {ind_str}")
+            banner.append(_SEP_HASH)
+            sys.stdout.write("\n".join(banner) + "\n")
 
             # Atualiza payout atual do ativo
             try:
@@ -1257,7 +1336,7 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
                         alt_info = await quotex.check_asset(melhor["interno"])
                         asset = melhor["interno"]
                         asset_real = alt_info["asset_resolvido"]
-                        payout = quotex.get_payout(asset)["payout"]
+                        payout = round(melhor["payout_pct"] / 100, 4)  # mesmo dict do get_payout
                         print(f"  [PAYOUT] Novo ativo principal: {melhor['display']} | Payout: {melhor['payout_pct']}%")
                         print(f"  [PAYOUT] Sinal descartado. Analisando novo ativo a partir do proximo candle.")
                     except Exception as e:
@@ -1305,12 +1384,12 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
             print(f"\n  -> {labels.get(cenario_final, '?')} | R${round(lucro_seq, 2)}")
             log_s("INFO", f"Ciclo AUTONOMO | {asset_real} | {sinal.upper()} | {estrategia_nome} | C{cenario_final} | R${round(lucro_seq,2)}")
 
-            analise = analisador.analisar()
+            analise, saldo_real = await _analisar_e_saldo(analisador, quotex)
             rec = analise["recomendacao"]
             met = analise["metricas"]
 
-            saldo_real = await quotex.get_saldo()
             protetor.sincronizar_saldo(saldo_real['saldo'])
+            pre = None  # historico, saldo e ops mudaram: protetor reverifica no proximo candle
             print(f"  Saldo: R${saldo_real['saldo']} | Taxa: {met['taxa_acerto']}% | Ops: {ops_executadas} | Candles: {candles_analisados}")
 
             if rec["acao"] == "PAUSAR":
@@ -1325,18 +1404,19 @@ async def _loop_autonomo_async(protetor: AgentProtetor, analisador: AgentAnalisa
         print(f"\n\n  [!] Saida imediata")
     finally:
         _restaurar_shutdown(handler_orig)
+        _flush_alerts()
         if _shutdown_gracioso.is_set():
             print(f"\n  [!] Encerrado apos operacao registrada.")
 
     # Relatorio final
-    print(f"\n{'=' * 55}")
-    print(f"  RELATORIO FINAL - LOOP AUTONOMO ({estrategia_nome})")
-    print(f"{'=' * 55}\n")
+    sys.stdout.write(f"\n{_SEP_EQ}\n  RELATORIO FINAL - LOOP AUTONOMO ({estrategia_nome})\n{_SEP_EQ}\n\n")
     analisador.gerar_relatorio(salvar=True, imprimir=True)
-    print(f"\n  Candles analisados: {candles_analisados}")
-    print(f"  Operacoes: {ops_executadas} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}")
-    print(f"  [Salvo em relatorio.txt]")
-    print(f"{'=' * 55}\n")
+    sys.stdout.write("\n".join([
+        f"\n  Candles analisados: {candles_analisados}",
+        f"  Operacoes: {ops_executadas} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}",
+        "  [Salvo em relatorio.txt]",
+        f"{_SEP_EQ}\n",
+    ]) + "\n")
     log_s("INFO", f"Loop AUTONOMO encerrado | {estrategia_nome} | Candles: {candles_analisados} | Ops: {ops_executadas} | Lucro: R${round(lucro_session,2)} | C3: {cenarios_3_session}")
 
     await quotex.desconectar()
@@ -1919,7 +1999,7 @@ async def _backteste_async():
     if not cancel and v.strip().lower() == "s":
         mg_suffix = f"_MG{mg_niveis}" if mg_ativo else ""
         nome_arquivo = f"backteste_{estrategia_nome}{mg_suffix}_{ativo_sel['display'].replace('/', '_').replace(' ', '_')}.txt"
-        arq_path = Path(__file__).resolve().parent / "logs" / nome_arquivo
+        arq_path = _BASE_DIR / "logs" / nome_arquivo
         try:
             with open(arq_path, "w", encoding="utf-8") as f:
                 f.write(f"BACKTESTE: {estrategia_nome}{mg_label}\n")
@@ -2092,7 +2172,7 @@ async def _backteste_ranking_async():
         return
 
     # --- Ordenar por lucro simulado ---
-    ranking.sort(key=lambda r: r["lucro_simulado"], reverse=True)
+    ranking.sort(key=itemgetter("lucro_simulado"), reverse=True)
 
     # --- Exibir tabela de ranking ---
     W = 74
@@ -2138,7 +2218,7 @@ async def _backteste_ranking_async():
     if not cancel and v.strip().lower() == "s":
         mg_suffix = f"_MG{mg_niveis}" if mg_ativo else ""
         nome_arquivo = f"ranking_{estrategia_nome}{mg_suffix}_{tf_label}.txt"
-        arq_path = Path(__file__).resolve().parent / "logs" / nome_arquivo
+        arq_path = _BASE_DIR / "logs" / nome_arquivo
         try:
             with open(arq_path, "w", encoding="utf-8") as f:
                 f.write(f"RANKING: {estrategia_nome}{mg_label}\n")
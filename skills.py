@@ -3,27 +3,75 @@ Skills - funcoes utilitarias que os agentes utilizam.
 Cada skill e uma funcao pura que recebe dados e retorna resultado.
 """
 
+import os
+import re
 import json
-import random
+import atexit
+import threading
 from datetime import datetime
+from functools import partial
 from pathlib import Path
+from typing import NamedTuple
 
-# Arquivo de historico de operacoes
-OPERATIONS_FILE = Path(__file__).resolve().parent / "data" / "operacoes.json"
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import carregar_config
+
+try:
+    import orjson  # opcional: parse/serializacao JSON em C (3-8x mais rapido)
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _loads = orjson.loads
+
+    def _dumps_linha(obj) -> bytes:
+        """Serializa obj como uma linha JSON (bytes, terminada em newline)."""
+        return orjson.dumps(obj) + b"\n"
+
+    def _dumps(obj) -> str:
+        """Serializa o resultado de uma tool (chaves nao-str, ex: cenarios int, viram texto)."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+else:
+    _loads = json.loads
+
+    def _dumps_linha(obj) -> bytes:
+        """Serializa obj como uma linha JSON (bytes, terminada em newline)."""
+        return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+    _dumps = partial(json.dumps, ensure_ascii=False)
+
+
+# Diretorio do projeto (resolvido uma vez no import)
+_BASE_DIR = Path(__file__).resolve().parent
+
+# Arquivo de historico de operacoes (JSON Lines: uma operacao por linha, append-only)
+OPERATIONS_FILE = _BASE_DIR / "data" / "operacoes.jsonl"
+# Formato antigo (array JSON reescrito a cada operacao) - migrado na primeira leitura
+_OPERATIONS_FILE_LEGADO = OPERATIONS_FILE.with_suffix(".json")
+_FSYNC_A_CADA = 20  # operacoes gravadas entre fsyncs (flush vai para o SO a cada lote)
+_ops_sem_fsync = 0
 
 
 # ============================================================
 # SKILLS DE ANALISE TECNICA
 # ============================================================
 
+_PALAVRAS_POSITIVAS = ("alta", "bull", "compra", "lucro", "sobe", "valoriza", "otimismo")
+_PALAVRAS_NEGATIVAS = ("baixa", "bear", "venda", "perda", "cai", "desvaloriza", "pessimismo")
+
+# Uma passada por conjunto. Lookahead para achar ocorrencias sobrepostas:
+# mesma semantica de "palavra in texto" (substring, conta 1 por palavra).
+_POS_RE = re.compile("(?=(" + "|".join(_PALAVRAS_POSITIVAS) + "))")
+_NEG_RE = re.compile("(?=(" + "|".join(_PALAVRAS_NEGATIVAS) + "))")
+
+
 def analisar_sentimento(texto: str) -> dict:
     """Analisa sentimento de um texto sobre mercado."""
-    palavras_positivas = ["alta", "bull", "compra", "lucro", "sobe", "valoriza", "otimismo"]
-    palavras_negativas = ["baixa", "bear", "venda", "perda", "cai", "desvaloriza", "pessimismo"]
-
     texto_lower = texto.lower()
-    score_pos = sum(1 for p in palavras_positivas if p in texto_lower)
-    score_neg = sum(1 for p in palavras_negativas if p in texto_lower)
+    score_pos = len(set(_POS_RE.findall(texto_lower)))
+    score_neg = len(set(_NEG_RE.findall(texto_lower)))
     total = score_pos + score_neg
 
     if total == 0:
@@ -35,13 +83,25 @@ def analisar_sentimento(texto: str) -> dict:
 
 
 def calcular_media_movel(precos: list[float], periodo: int = 20) -> list[float]:
-    """Calcula media movel simples."""
+    """Calcula media movel simples (todas as janelas de uma vez, em NumPy)."""
     if len(precos) < periodo:
         return []
-    return [
-        round(sum(precos[i:i + periodo]) / periodo, 2)
-        for i in range(len(precos) - periodo + 1)
-    ]
+    somas = _somas_janelas(np.asarray(precos, dtype=np.float64), periodo)
+    return [round(v, 2) for v in (somas / periodo).tolist()]
+
+
+def _somas_janelas(precos: np.ndarray, periodo: int) -> np.ndarray:
+    """Soma de cada janela de 'periodo' precos (len(precos) >= periodo).
+
+    Soma coluna a coluna, da esquerda para a direita: mesma ordem do sum()
+    por janela, entao os valores sao identicos (a diferenca de somas
+    acumuladas ou a soma em pares do NumPy mudam o arredondamento).
+    """
+    janelas = sliding_window_view(precos, periodo)
+    somas = janelas[:, 0].copy()
+    for j in range(1, periodo):
+        somas += janelas[:, j]
+    return somas
 
 
 def detectar_cruzamento(curta: list[float], longa: list[float]) -> str | None:
@@ -60,12 +120,10 @@ def calcular_rsi(precos: list[float], periodo: int = 14) -> float | None:
     if len(precos) < periodo + 1:
         return None
 
-    deltas = [precos[i + 1] - precos[i] for i in range(len(precos) - 1)]
-    ganhos = [d for d in deltas[-periodo:] if d > 0]
-    perdas = [-d for d in deltas[-periodo:] if d < 0]
-
-    media_ganho = sum(ganhos) / periodo if ganhos else 0
-    media_perda = sum(perdas) / periodo if perdas else 0
+    deltas = np.diff(np.asarray(precos[-(periodo + 1):], dtype=np.float64))
+    # sum() sequencial (np.sum soma em pares e pode mudar o arredondamento)
+    media_ganho = sum(deltas[deltas > 0].tolist()) / periodo
+    media_perda = sum((-deltas[deltas < 0]).tolist()) / periodo
 
     if media_perda == 0:
         return 100.0
@@ -73,6 +131,14 @@ def calcular_rsi(precos: list[float], periodo: int = 14) -> float | None:
     return round(100 - (100 / (1 + rs)), 2)
 
 
+# Pontos por cruzamento / sentimento (tabela em vez de cadeia de if/elif)
+_CRUZAMENTO_PONTOS = {
+    "golden_cross": (1, "Golden cross detectado"),
+    "death_cross": (-1, "Death cross detectado"),
+}
+_SENTIMENTO_PONTOS = {"positivo": 1, "negativo": -1}
+
+
 def gerar_sinal(rsi: float | None, cruzamento: str | None, sentimento: dict) -> dict:
     """Gera sinal de trading combinando indicadores."""
     pontos = 0
@@ -86,27 +152,18 @@ def gerar_sinal(rsi: float | None, cruzamento: str | None, sentimento: dict) ->
             pontos -= 1
             razoes.append(f"RSI sobrecomprado ({rsi})")
 
-    if cruzamento == "golden_cross":
-        pontos += 1
-        razoes.append("Golden cross detectado")
-    elif cruzamento == "death_cross":
-        pontos -= 1
-        razoes.append("Death cross detectado")
-
-    if sentimento["sentimento"] == "positivo":
-        pontos += 1
-        razoes.append(f"Sentimento positivo ({sentimento['confianca']})")
-    elif sentimento["sentimento"] == "negativo":
-        pontos -= 1
-        razoes.append(f"Sentimento negativo ({sentimento['confianca']})")
-
-    if pontos >= 2:
-        acao = "COMPRAR"
-    elif pontos <= -2:
-        acao = "VENDER"
-    else:
-        acao = "AGUARDAR"
+    cruz = _CRUZAMENTO_PONTOS.get(cruzamento)
+    if cruz:
+        pontos += cruz[0]
+        razoes.append(cruz[1])
 
+    sent = sentimento["sentimento"]
+    delta = _SENTIMENTO_PONTOS.get(sent)
+    if delta:
+        pontos += delta
+        razoes.append(f"Sentimento {sent} ({sentimento['confianca']})")
+
+    acao = "COMPRAR" if pontos >= 2 else "VENDER" if pontos <= -2 else "AGUARDAR"
     return {"acao": acao, "pontos": pontos, "razoes": razoes}
 
 
@@ -117,15 +174,15 @@ def gerar_sinal(rsi: float | None, cruzamento: str | None, sentimento: dict) ->
 def skill_read_balance() -> dict:
     """Retorna saldo simulado da conta."""
     saldo_inicial = 1000.0
-    operacoes = _load_operations()
-
-    lucro_total = sum(op.get("profit", 0) for op in operacoes)
+    snap = stats_snapshot()
+    lucro_total = snap["profit_sum"]
+    total_operacoes = snap["total_operacoes"]
     saldo_atual = saldo_inicial + lucro_total
 
     return {
         "saldo_inicial": saldo_inicial,
         "saldo_atual": round(saldo_atual, 2),
-        "total_operacoes": len(operacoes),
+        "total_operacoes": total_operacoes,
         "lucro_acumulado": round(lucro_total, 2),
     }
 
@@ -175,10 +232,15 @@ def skill_calculate_mg(
     }
 
 
+_RNG = np.random.default_rng()
+_SIM_PAYOUT = 0.85
+_SIM_CHANCE_WIN = 0.55
+
+
 def skill_execute_operation(asset: str, direction: str, amount: float) -> dict:
     """Simula execucao de operacao binaria.
 
-    Simula resultado com 55% de chance de win (leve edge).
+    Simula resultado com 55% de chance de win (leve edge), sorteado no _RNG.
     """
     direction = direction.lower()
     if direction not in ("call", "put"):
@@ -187,9 +249,8 @@ def skill_execute_operation(asset: str, direction: str, amount: float) -> dict:
     if amount <= 0:
         return {"success": False, "erro": "amount deve ser positivo"}
 
-    payout = 0.85
-    win = random.random() < 0.55
-    profit = round(amount * payout, 2) if win else round(-amount, 2)
+    win = _RNG.random() < _SIM_CHANCE_WIN
+    profit = round(amount * _SIM_PAYOUT, 2) if win else round(-amount, 2)
 
     return {
         "success": True,
@@ -203,23 +264,57 @@ def skill_execute_operation(asset: str, direction: str, amount: float) -> dict:
 
 
 def skill_register_operation(data: dict) -> dict:
-    """Salva operacao no arquivo operacoes.json.
+    """Salva operacao no arquivo operacoes.jsonl.
 
     Aceita campos extras como: cenario, nivel_mg, sequencia_id.
     """
-    operacoes = _load_operations()
+    return skill_register_operations([data])
+
 
-    if "timestamp" not in data:
-        data["timestamp"] = datetime.now().isoformat()
+def skill_register_operations(lote: list[dict]) -> dict:
+    """Acrescenta um lote de operacoes ao operacoes.jsonl com uma unica escrita.
 
-    operacoes.append(data)
+    Usado pelo flusher em background dos loops (varias operacoes do mesmo
+    ciclo MG viram um so write). Custo O(lote), independente do historico.
+    O fsync (garantia em disco) e feito a cada _FSYNC_A_CADA operacoes.
+    Registros invalidos (ver Op.from_dict) sao recusados antes de qualquer
+    escrita; os validos do lote sao gravados normalmente.
+    """
+    global _ops_sem_fsync
+    agora = datetime.now().isoformat()
+    validos, recs, partes, erros = [], [], [], []
+    for data in lote:
+        try:
+            if isinstance(data, dict) and "timestamp" not in data:
+                data["timestamp"] = agora
+            rec = Op.from_dict(data)
+            linha = _dumps_linha(data)
+        except (ValueError, TypeError) as e:  # orjson.JSONEncodeError herda de TypeError
+            erros.append(str(e))
+            continue
+        validos.append(data)
+        recs.append(rec)
+        partes.append(linha)
+
+    if not validos:
+        return {"success": False, "erro": f"Operacao invalida: {'; '.join(erros)}"}
 
     try:
-        tmp = OPERATIONS_FILE.with_suffix(".tmp")
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(operacoes, f, ensure_ascii=False, indent=2)
-        tmp.replace(OPERATIONS_FILE)  # atomico: substitui so quando gravacao esta completa
-        return {"success": True, "total_operacoes": len(operacoes)}
+        linhas = b"".join(partes)
+        with _OPS_LOCK:
+            _ops_cached()  # garante cache em dia antes de acrescentar o lote
+            with open(OPERATIONS_FILE, "ab", buffering=1 << 16) as f:
+                f.write(linhas)
+                f.flush()
+                _ops_sem_fsync += len(validos)
+                if _ops_sem_fsync >= _FSYNC_A_CADA:
+                    os.fsync(f.fileno())
+                    _ops_sem_fsync = 0
+            _ops_cache_append(validos, recs, linhas)
+            resultado = {"success": not erros, "total_operacoes": len(_ops_cache["ops"])}
+            if erros:
+                resultado["erro"] = f"{len(erros)} operacao(oes) invalida(s) recusada(s): {'; '.join(erros)}"
+            return resultado
     except Exception as e:
         return {"success": False, "erro": str(e)}
 
@@ -252,77 +347,19 @@ def skill_generate_report() -> dict:
 
     Calcula: taxa de acerto, lucro total, cenarios 3, stats por asset, etc.
     """
-    operacoes = _load_operations()
-
-    if not operacoes:
+    snap = stats_snapshot(detalhado=True)
+    total = snap["total_operacoes"]
+    if not total:
         return {
             "total_operacoes": 0,
             "mensagem": "Nenhuma operacao registrada ainda.",
         }
 
-    # --- Metricas gerais ---
-    total = len(operacoes)
-    wins = [op for op in operacoes if op.get("result") == "WIN"]
-    losses = [op for op in operacoes if op.get("result") == "LOSS"]
-    total_wins = len(wins)
-    total_losses = len(losses)
+    rel = snap["relatorio"]
+    lucro_total = round(snap["profit_sum"], 2)
+    total_wins = rel["wins"]
     taxa_acerto = round((total_wins / total) * 100, 1) if total > 0 else 0
 
-    lucro_total = round(sum(op.get("profit", 0) for op in operacoes), 2)
-    total_ganho = round(sum(op.get("profit", 0) for op in wins), 2)
-    total_perdido = round(sum(op.get("profit", 0) for op in losses), 2)
-
-    # --- Deteccao de Cenarios 3 ---
-    cenarios_3 = [op for op in operacoes if op.get("cenario") == 3]
-    total_cenarios_3 = len(cenarios_3)
-    perda_cenarios_3 = round(sum(op.get("profit", 0) for op in cenarios_3), 2)
-
-    # --- Contagem por cenario ---
-    cenarios = {}
-    for op in operacoes:
-        c = op.get("cenario")
-        if c is not None:
-            cenarios[c] = cenarios.get(c, 0) + 1
-
-    # --- Stats por asset ---
-    assets = {}
-    for op in operacoes:
-        a = op.get("asset", "UNKNOWN")
-        if a not in assets:
-            assets[a] = {"wins": 0, "losses": 0, "profit": 0}
-        if op.get("result") == "WIN":
-            assets[a]["wins"] += 1
-        elif op.get("result") == "LOSS":
-            assets[a]["losses"] += 1
-        assets[a]["profit"] = round(assets[a]["profit"] + op.get("profit", 0), 2)
-
-    # --- Stats por nivel MG ---
-    niveis = {}
-    for op in operacoes:
-        n = op.get("nivel_mg", "entrada")
-        if n not in niveis:
-            niveis[n] = {"wins": 0, "losses": 0, "profit": 0}
-        if op.get("result") == "WIN":
-            niveis[n]["wins"] += 1
-        elif op.get("result") == "LOSS":
-            niveis[n]["losses"] += 1
-        niveis[n]["profit"] = round(niveis[n]["profit"] + op.get("profit", 0), 2)
-
-    # --- Sequencias (streaks) ---
-    maior_win_streak = 0
-    maior_loss_streak = 0
-    win_streak = 0
-    loss_streak = 0
-    for op in operacoes:
-        if op.get("result") == "WIN":
-            win_streak += 1
-            loss_streak = 0
-            maior_win_streak = max(maior_win_streak, win_streak)
-        elif op.get("result") == "LOSS":
-            loss_streak += 1
-            win_streak = 0
-            maior_loss_streak = max(maior_loss_streak, loss_streak)
-
     # --- Saldo ---
     saldo_inicial = 1000.0
     saldo_atual = round(saldo_inicial + lucro_total, 2)
@@ -330,20 +367,20 @@ def skill_generate_report() -> dict:
     return {
         "total_operacoes": total,
         "wins": total_wins,
-        "losses": total_losses,
+        "losses": rel["losses"],
         "taxa_acerto_pct": taxa_acerto,
         "lucro_total": lucro_total,
-        "total_ganho": total_ganho,
-        "total_perdido": total_perdido,
+        "total_ganho": rel["total_ganho"],
+        "total_perdido": rel["total_perdido"],
         "saldo_inicial": saldo_inicial,
         "saldo_atual": saldo_atual,
-        "cenarios": cenarios,
-        "cenarios_3_total": total_cenarios_3,
-        "cenarios_3_perda": perda_cenarios_3,
-        "stats_por_asset": assets,
-        "stats_por_nivel_mg": niveis,
-        "maior_win_streak": maior_win_streak,
-        "maior_loss_streak": maior_loss_streak,
+        "cenarios": rel["cenarios"],
+        "cenarios_3_total": snap["cenarios_3"],
+        "cenarios_3_perda": rel["cenarios_3_perda"],
+        "stats_por_asset": rel["stats_por_asset"],
+        "stats_por_nivel_mg": rel["stats_por_nivel_mg"],
+        "maior_win_streak": rel["maior_win_streak"],
+        "maior_loss_streak": rel["maior_loss_streak"],
     }
 
 
@@ -351,17 +388,22 @@ def skill_generate_report() -> dict:
 # SKILLS DE PROTECAO
 # ============================================================
 
-ALERTS_FILE = Path(__file__).resolve().parent / "data" / "alertas.json"
-SALDO_INICIAL = 1000.0  # fallback - sobrescrito por config.json
+# Alertas em JSON Lines (append); alertas.json antigo e migrado no primeiro acesso
+ALERTS_FILE = _BASE_DIR / "data" / "alertas.jsonl"
+_ALERTS_FILE_LEGADO = ALERTS_FILE.with_suffix(".json")
+_ALERT_BUF_MAX = 10  # alertas acumulados em memoria antes de gravar
+_ALERTAS_IMEDIATOS = frozenset({"STOP_LOSS", "CENARIO_3"})  # gravados na hora, sem esperar o lote
+
+_ALERTS_LOCK = threading.RLock()
+_alert_buf: list[bytes] = []
+_alertas_total: int | None = None  # contagem (arquivo + buffer), inicializada sob demanda
 
+SALDO_INICIAL = 1000.0  # fallback - sobrescrito por config.json
 
 def _get_saldo_inicial() -> float:
-    """Le saldo_inicial do config.json. Fallback para SALDO_INICIAL global."""
+    """Le saldo_inicial do config.json (via carregar_config). Fallback para SALDO_INICIAL global."""
     try:
-        config_path = Path(__file__).resolve().parent / "data" / "config.json"
-        with open(config_path, "r", encoding="utf-8") as f:
-            cfg = json.load(f)
-        return float(cfg.get("saldo_inicial", SALDO_INICIAL))
+        return float(carregar_config().get("saldo_inicial", SALDO_INICIAL))
     except Exception:
         return SALDO_INICIAL
 
@@ -377,35 +419,27 @@ def skill_check_protection(
     Retorna pode_continuar=True/False e diagnostico completo.
 
     saldo_atual_override: quando informado, usa o saldo real da Quotex
-    em vez de calcular pelo historico de operacoes.json.
+    em vez de calcular pelo historico de operacoes.jsonl.
     """
     if saldo_inicial is None:
         saldo_inicial = _get_saldo_inicial()
 
-    operacoes = _load_operations()
+    snap = stats_snapshot()
+    lucro_hist = snap["profit_sum"]
+    cenarios_3 = snap["cenarios_3"]
+    loss_streak_atual = snap["loss_streak"]
+    total_operacoes = snap["total_operacoes"]
 
     if saldo_atual_override is not None:
         # Modo Quotex: usa saldo real da corretora
         saldo_atual = saldo_atual_override
     else:
         # Modo simulacao: calcula pelo historico local
-        lucro_total = sum(op.get("profit", 0) for op in operacoes)
-        saldo_atual = saldo_inicial + lucro_total
+        saldo_atual = saldo_inicial + lucro_hist
 
     perda_pct = ((saldo_inicial - saldo_atual) / saldo_inicial) * 100 if saldo_atual < saldo_inicial else 0
     lucro_total_reais = round(saldo_atual - saldo_inicial, 2)
 
-    # Contagem de cenarios 3
-    cenarios_3 = sum(1 for op in operacoes if op.get("cenario") == 3)
-
-    # Loss streak atual (ultimas operacoes consecutivas)
-    loss_streak_atual = 0
-    for op in reversed(operacoes):
-        if op.get("result") == "LOSS":
-            loss_streak_atual += 1
-        else:
-            break
-
     # Decisao
     pode_continuar = perda_pct < limite_perda_pct
     motivo = None
@@ -426,7 +460,7 @@ def skill_check_protection(
         "lucro_total_reais": lucro_total_reais,
         "perda_pct": round(perda_pct, 1),
         "limite_perda_pct": limite_perda_pct,
-        "total_operacoes": len(operacoes),
+        "total_operacoes": total_operacoes,
         "cenarios_3": cenarios_3,
         "loss_streak_atual": loss_streak_atual,
         "max_loss_streak": max_loss_streak,
@@ -439,11 +473,14 @@ def skill_check_protection(
 
 
 def skill_log_alert(tipo: str, mensagem: str, dados: dict | None = None) -> dict:
-    """Salva alerta no arquivo alertas.json.
+    """Registra alerta no alertas.jsonl.
 
     Tipos: STOP_LOSS, CENARIO_3, LOSS_STREAK, WARNING, INFO.
+    Os alertas ficam num buffer em memoria e sao gravados em lote
+    (a cada _ALERT_BUF_MAX alertas, no fim de cada loop e via atexit).
+    STOP_LOSS e CENARIO_3 sao gravados na hora (junto com o buffer).
     """
-    alertas = _load_alerts()
+    global _alertas_total
 
     alerta = {
         "tipo": tipo.upper(),
@@ -453,42 +490,391 @@ def skill_log_alert(tipo: str, mensagem: str, dados: dict | None = None) -> dict
     if dados:
         alerta["dados"] = dados
 
-    alertas.append(alerta)
-
     try:
-        tmp = ALERTS_FILE.with_suffix(".tmp")
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(alertas, f, ensure_ascii=False, indent=2)
-        tmp.replace(ALERTS_FILE)  # atomico
-        return {"success": True, "total_alertas": len(alertas)}
+        linha = _dumps_linha(alerta)
+        with _ALERTS_LOCK:
+            if _alertas_total is None:
+                _alertas_total = len(_load_alerts())
+            _alert_buf.append(linha)
+            _alertas_total += 1
+            if alerta["tipo"] in _ALERTAS_IMEDIATOS or len(_alert_buf) >= _ALERT_BUF_MAX:
+                _flush_alerts()
+            return {"success": True, "total_alertas": _alertas_total}
     except Exception as e:
         return {"success": False, "erro": str(e)}
 
 
+def _flush_alerts() -> None:
+    """Grava os alertas do buffer no alertas.jsonl (uma unica escrita)."""
+    with _ALERTS_LOCK:
+        if not _alert_buf:
+            return
+        _migrar_alertas_legado()
+        with open(ALERTS_FILE, "ab") as f:
+            f.write(b"".join(_alert_buf))
+        _alert_buf.clear()
+
+
+atexit.register(_flush_alerts)
+
+
 def _load_alerts() -> list:
-    """Carrega alertas do arquivo JSON."""
-    if not ALERTS_FILE.exists():
-        return []
+    """Carrega alertas do alertas.jsonl (inclui os ainda no buffer)."""
+    with _ALERTS_LOCK:
+        _migrar_alertas_legado()
+        try:
+            dados = ALERTS_FILE.read_bytes()
+        except OSError:
+            dados = b""
+        return list(_iter_operations(dados + b"".join(_alert_buf)))
+
+
+def _migrar_alertas_legado() -> None:
+    """Converte o alertas.json (array) para alertas.jsonl, uma unica vez."""
+    if ALERTS_FILE.exists() or not _ALERTS_FILE_LEGADO.exists():
+        return
     try:
-        with open(ALERTS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return []
+        alertas = _loads(_ALERTS_FILE_LEGADO.read_bytes())
+        tmp = ALERTS_FILE.with_suffix(".tmp")
+        tmp.write_bytes(b"".join(_dumps_linha(a) for a in alertas))
+        tmp.replace(ALERTS_FILE)
+        _ALERTS_FILE_LEGADO.replace(_ALERTS_FILE_LEGADO.with_suffix(".json.bak"))
+    except (json.JSONDecodeError, IOError):  # orjson.JSONDecodeError herda de json.JSONDecodeError
+        pass
 
 
 # ============================================================
 # INTERNO
 # ============================================================
 
-def _load_operations() -> list:
-    """Carrega operacoes do arquivo JSON."""
-    if not OPERATIONS_FILE.exists():
-        return []
+class Op(NamedTuple):
+    """Registro de uma operacao (so os campos usados nos agregados).
+
+    O dict original continua sendo o formato de gravacao e o que os leitores
+    do historico recebem. No cache os campos ficam em colunas (ver _soa_vazio).
+    """
+    asset: str
+    direction: str | None
+    amount: float
+    result: str | None
+    profit: float
+    cenario: int | None
+    nivel_mg: str
+    timestamp: str | None
+
+    @classmethod
+    def from_dict(cls, op: dict) -> "Op":
+        """Converte o dict gravado em Op (defaults iguais aos do relatorio).
+
+        Levanta ValueError se o registro nao for um objeto ou se amount/profit
+        nao forem numericos. Campos categoricos nao hashaveis (ex: lista)
+        viram _CATEGORIA_INVALIDA.
+        """
+        if not isinstance(op, dict):
+            raise ValueError(f"operacao deve ser um objeto, recebido {type(op).__name__}")
+        g = op.get
+        try:
+            amount = float(g("amount", 0))
+            profit = float(g("profit", 0))
+        except (TypeError, ValueError):
+            raise ValueError("amount/profit devem ser numericos") from None
+        return cls(_categoria(g("asset", "UNKNOWN")), _categoria(g("direction")), amount,
+                   _categoria(g("result")), profit, _categoria(g("cenario")),
+                   _categoria(g("nivel_mg", "entrada")), g("timestamp"))
+
+
+_CATEGORIA_INVALIDA = "INVALIDO"  # valor categorico nao hashavel no registro
+
+
+def _categoria(valor):
+    """Valor categorico usavel como chave de vocab (nao hashavel -> sentinela)."""
     try:
-        with open(OPERATIONS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        hash(valor)
+    except TypeError:
+        return _CATEGORIA_INVALIDA
+    return valor
+
+
+# Colunas do historico em memoria (SoA): uma array NumPy por campo.
+# Campos texto/categoricos viram ids (int32) via vocab, na ordem de 1a aparicao.
+_SOA_NUMERICAS = ("amount", "profit")
+_SOA_CATEGORICAS = ("asset", "direction", "result", "cenario", "nivel_mg")
+
+
+def _soa_vazio(capacidade: int = 1024) -> dict:
+    """Colunas vazias (pre-alocadas) + vocabularios."""
+    cols = {k: np.empty(capacidade, dtype=np.float64) for k in _SOA_NUMERICAS}
+    cols.update({k: np.empty(capacidade, dtype=np.int32) for k in _SOA_CATEGORICAS})
+    return {"n": 0, "cols": cols, "vocab": {k: {} for k in _SOA_CATEGORICAS}}
+
+
+def _soa_append(soa: dict, rec: Op) -> None:
+    """Acrescenta um Op as colunas (capacidade dobra quando enche: O(1) amortizado)."""
+    n, cols = soa["n"], soa["cols"]
+    if n == len(cols["profit"]):
+        for k, arr in cols.items():
+            nova = np.empty(2 * n, dtype=arr.dtype)
+            nova[:n] = arr
+            cols[k] = nova
+    cols["amount"][n] = rec.amount
+    cols["profit"][n] = rec.profit
+    for k in _SOA_CATEGORICAS:
+        v = soa["vocab"][k]
+        cols[k][n] = v.setdefault(getattr(rec, k), len(v))
+    soa["n"] = n + 1
+
+
+# Cache do historico + agregados usados pelo protetor a cada verificacao.
+# Chave = (mtime_ns, size) do arquivo: edicao externa invalida o cache;
+# gravacoes feitas por este processo atualizam os agregados incrementalmente.
+_ASSINATURA_BYTES = 4096  # bytes finais ja parseados comparados antes de ler so o final
+# _OPS_LOCK protege cache e arquivo: o flusher dos loops grava em outra thread
+# (asyncio.to_thread) enquanto protetor/analisador leem.
+_OPS_LOCK = threading.RLock()
+_ops_cache: dict = {
+    "chave": None,
+    "ops": [],
+    "soa": _soa_vazio(),  # colunas paralelas a "ops" (usadas nas passadas de agregacao)
+    "profit_sum": 0.0,
+    "loss_streak": 0,   # LOSS consecutivos no fim do historico
+    "cenarios_3": 0,
+    "offset": 0,        # bytes do arquivo ja parseados (fim da ultima linha lida)
+    "assinatura": b"",  # ultimos bytes ja parseados (ate offset), conferidos antes do append
+    "relatorio": None,  # agregados do relatorio (ver stats_snapshot)
+    "relatorio_chave": None,
+}
+
+
+def _stat_chave(path: Path) -> tuple[int, int] | None:
+    """(mtime_ns, size) do arquivo, ou None se nao existir."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _acumular(op: dict, rec: Op) -> None:
+    """Acrescenta a operacao (dict + colunas) e soma aos agregados do cache."""
+    _ops_cache["ops"].append(op)
+    _soa_append(_ops_cache["soa"], rec)
+    _ops_cache["profit_sum"] += rec.profit
+    if rec.result == "LOSS":
+        _ops_cache["loss_streak"] += 1
+    else:
+        _ops_cache["loss_streak"] = 0
+    if rec.cenario == 3:
+        _ops_cache["cenarios_3"] += 1
+
+
+def _ops_cached() -> dict:
+    """Retorna o cache do historico, relendo o arquivo so se ele mudou."""
+    with _OPS_LOCK:
+        if _ops_cache["chave"] is None:
+            _migrar_operacoes_legado()
+        chave = _stat_chave(OPERATIONS_FILE)
+        if chave != _ops_cache["chave"] and not _ops_cache_tail(chave):
+            registros, dados = _ler_operacoes()
+            _ops_cache.update(chave=chave, ops=[], soa=_soa_vazio(), profit_sum=0.0, loss_streak=0,
+                              cenarios_3=0, offset=len(dados), assinatura=dados[-_ASSINATURA_BYTES:])
+            for op, rec in registros:
+                _acumular(op, rec)
+        return _ops_cache
+
+
+def _ops_cache_tail(chave: tuple[int, int] | None) -> bool:
+    """Se o arquivo so cresceu desde o cache (append externo), parseia so o final.
+
+    Le a partir do offset ja consumido e acumula as linhas novas completas.
+    Retorna False quando nao da para garantir que foi append puro -> releitura
+    completa: tamanho igual ou menor (reescrita, mesmo com mtime novo), arquivo
+    removido, offset fora de fim de linha ou os ultimos bytes ja parseados
+    (assinatura) diferentes do que esta no arquivo.
+    """
+    offset = _ops_cache["offset"]
+    assinatura = _ops_cache["assinatura"]
+    if _ops_cache["chave"] is None or chave is None or chave[1] <= _ops_cache["chave"][1]:
+        return False
+    if offset and not assinatura.endswith(b"\n"):
+        return False
+    try:
+        with open(OPERATIONS_FILE, "rb") as f:
+            f.seek(offset - len(assinatura))
+            if f.read(len(assinatura)) != assinatura:
+                return False
+            novos = f.read()
+    except OSError:
+        return False
+
+    fim = novos.rfind(b"\n") + 1  # linha final incompleta fica para a proxima leitura
+    for op, rec in _iter_registros(novos[:fim]):
+        _acumular(op, rec)
+    _ops_cache["offset"] = offset + fim
+    _ops_cache["assinatura"] = (assinatura + novos[:fim])[-_ASSINATURA_BYTES:]
+    _ops_cache["chave"] = chave
+    return True
+
+
+def _ops_cache_append(lote: list[dict], recs: list[Op], linhas: bytes) -> None:
+    """Atualiza o cache apos acrescentar 'lote' (serializado em 'linhas') ao arquivo."""
+    for op, rec in zip(lote, recs):
+        _acumular(op, rec)
+    _ops_cache["offset"] += len(linhas)
+    _ops_cache["assinatura"] = (_ops_cache["assinatura"] + linhas)[-_ASSINATURA_BYTES:]
+    _ops_cache["chave"] = _stat_chave(OPERATIONS_FILE)
+
+
+def _iter_operations(dados: bytes):
+    """Gera as operacoes de um trecho do operacoes.jsonl, uma por linha.
+
+    Linhas vazias ou corrompidas (ex: gravacao interrompida) sao ignoradas.
+    """
+    for linha in dados.splitlines():
+        if not linha.strip():
+            continue
+        try:
+            yield _loads(linha)
+        except json.JSONDecodeError:
+            continue
+
+
+def _iter_registros(dados: bytes):
+    """Gera pares (dict, Op) do operacoes.jsonl; registros invalidos sao ignorados."""
+    for op in _iter_operations(dados):
+        try:
+            yield op, Op.from_dict(op)
+        except ValueError:
+            continue
+
+
+def _ler_operacoes() -> tuple[list, bytes]:
+    """Le todas as operacoes do arquivo (sem cache). Retorna ([(op, Op)], conteudo lido)."""
+    try:
+        dados = OPERATIONS_FILE.read_bytes()
+    except OSError:
+        return [], b""
+    return list(_iter_registros(dados)), dados
+
+
+def _migrar_operacoes_legado() -> None:
+    """Converte o operacoes.json (array) para operacoes.jsonl, uma unica vez.
+
+    So roda se o .jsonl ainda nao existir. O arquivo antigo e mantido como .json.bak.
+    """
+    if OPERATIONS_FILE.exists() or not _OPERATIONS_FILE_LEGADO.exists():
+        return
+    try:
+        operacoes = _loads(_OPERATIONS_FILE_LEGADO.read_bytes())
+        tmp = OPERATIONS_FILE.with_suffix(".tmp")
+        tmp.write_bytes(b"".join(_dumps_linha(op) for op in operacoes))
+        tmp.replace(OPERATIONS_FILE)
+        _OPERATIONS_FILE_LEGADO.replace(_OPERATIONS_FILE_LEGADO.with_suffix(".json.bak"))
     except (json.JSONDecodeError, IOError):
-        return []
+        pass
+
+
+def stats_snapshot(detalhado: bool = False) -> dict:
+    """Todos os agregados do historico num unico dict, lidos juntos sob o lock.
+
+    Base de skill_read_balance, skill_check_protection e skill_generate_report.
+    Os agregados simples vem prontos do cache (O(1)). Com detalhado=True inclui
+    "relatorio" (stats por asset/nivel MG, cenarios, streaks): uma passada sobre
+    as colunas, memoizada ate o historico mudar.
+    """
+    with _OPS_LOCK:
+        cache = _ops_cached()
+        snap = {
+            "total_operacoes": cache["soa"]["n"],
+            "profit_sum": cache["profit_sum"],
+            "loss_streak": cache["loss_streak"],
+            "cenarios_3": cache["cenarios_3"],
+        }
+        if detalhado:
+            chave = (cache["chave"], cache["soa"]["n"])
+            if cache["relatorio_chave"] != chave:
+                cache["relatorio"] = _agregar_relatorio(cache["soa"])
+                cache["relatorio_chave"] = chave
+            rel = cache["relatorio"]
+            # Copia os dicts aninhados: o chamador pode alterar o retorno
+            snap["relatorio"] = {
+                **rel,
+                "cenarios": dict(rel["cenarios"]),
+                "stats_por_asset": {k: dict(v) for k, v in rel["stats_por_asset"].items()},
+                "stats_por_nivel_mg": {k: dict(v) for k, v in rel["stats_por_nivel_mg"].items()},
+            }
+    return snap
+
+
+def _streaks(wins: np.ndarray) -> tuple[int, int]:
+    """Maior sequencia de WIN e de LOSS (run-length vetorizado).
+
+    wins: bool por operacao decisiva (True = WIN, False = LOSS), em ordem.
+    """
+    if not len(wins):
+        return 0, 0
+    r = wins.astype(np.int8)
+    inicios = np.flatnonzero(np.diff(r, prepend=r[0] ^ 1))
+    tamanhos = np.diff(np.append(inicios, len(r)))
+    valores = r[inicios]
+    return int(tamanhos[valores == 1].max(initial=0)), int(tamanhos[valores == 0].max(initial=0))
+
+
+def _agregar_relatorio(soa: dict) -> dict:
+    """Metricas gerais, cenarios, asset, nivel MG e streaks sobre as colunas.
+
+    Somas por categoria via np.bincount (acumula na ordem do historico, mesmo
+    resultado da soma sequencial). Dicts de saida seguem a ordem de 1a aparicao.
+    """
+    n, vocab = soa["n"], soa["vocab"]
+    cols = {k: arr[:n] for k, arr in soa["cols"].items()}
+    profit, res = cols["profit"], cols["result"]
+    win_id = vocab["result"].get("WIN", -1)
+    loss_id = vocab["result"].get("LOSS", -1)
+    is_win, is_loss = res == win_id, res == loss_id
+
+    def _por_categoria(k: str) -> dict:
+        ids, m = cols[k], len(vocab[k])
+        wins = np.bincount(ids[is_win], minlength=m).tolist()
+        losses = np.bincount(ids[is_loss], minlength=m).tolist()
+        lucro = np.bincount(ids, weights=profit, minlength=m).tolist()
+        return {
+            valor: {"wins": wins[i], "losses": losses[i], "profit": round(lucro[i], 2)}
+            for valor, i in vocab[k].items()
+        }
+
+    m = len(vocab["result"])
+    cont_res = np.bincount(res, minlength=m).tolist()
+    soma_res = np.bincount(res, weights=profit, minlength=m).tolist()
+
+    m = len(vocab["cenario"])
+    cont_cen = np.bincount(cols["cenario"], minlength=m).tolist()
+    soma_cen = np.bincount(cols["cenario"], weights=profit, minlength=m).tolist()
+    cenarios = {c: cont_cen[i] for c, i in vocab["cenario"].items() if c is not None}
+    id_c3 = vocab["cenario"].get(3)
+
+    # Streaks: so WIN/LOSS contam (DOJI e afins nao quebram a sequencia)
+    maior_win_streak, maior_loss_streak = _streaks(is_win[is_win | is_loss])
+
+    return {
+        "wins": cont_res[win_id] if win_id >= 0 else 0,
+        "losses": cont_res[loss_id] if loss_id >= 0 else 0,
+        "total_ganho": round(soma_res[win_id], 2) if win_id >= 0 else 0.0,
+        "total_perdido": round(soma_res[loss_id], 2) if loss_id >= 0 else 0.0,
+        "cenarios": cenarios,
+        "cenarios_3_perda": round(soma_cen[id_c3], 2) if id_c3 is not None else 0.0,
+        "stats_por_asset": _por_categoria("asset"),
+        "stats_por_nivel_mg": _por_categoria("nivel_mg"),
+        "maior_win_streak": maior_win_streak,
+        "maior_loss_streak": maior_loss_streak,
+    }
+
+
+def _load_operations() -> list:
+    """Carrega operacoes (via cache).
+
+    A lista retornada e compartilhada com o cache: nao modificar.
+    """
+    return _ops_cached()["ops"]
 
 
 # ============================================================
@@ -575,7 +961,7 @@ TOOLS_SCHEMA = [
     },
     {
         "name": "register_operation",
-        "description": "Registra uma operacao no historico (operacoes.json). Passar dados completos incluindo: asset, direction, amount, result, profit, timestamp. Campos extras recomendados: cenario (1/2/3), nivel_mg ('entrada'/'mg1'/'mg2'), sequencia_id (para agrupar entrada+MGs da mesma operacao)",
+        "description": "Registra uma operacao no historico (operacoes.jsonl). Passar dados completos incluindo: asset, direction, amount, result, profit, timestamp. Campos extras recomendados: cenario (1/2/3), nivel_mg ('entrada'/'mg1'/'mg2'), sequencia_id (para agrupar entrada+MGs da mesma operacao)",
         "input_schema": {
             "type": "object",
             "properties": {
@@ -590,7 +976,7 @@ TOOLS_SCHEMA = [
     # --- Historico e Relatorio ---
     {
         "name": "read_history",
-        "description": "Le historico de operacoes do arquivo operacoes.json. Retorna as ultimas N operacoes com todos os campos (result, profit, cenario, nivel_mg, etc). Use para analisar padroes e aprender com resultados anteriores",
+        "description": "Le historico de operacoes do arquivo operacoes.jsonl. Retorna as ultimas N operacoes com todos os campos (result, profit, cenario, nivel_mg, etc). Use para analisar padroes e aprender com resultados anteriores",
         "input_schema": {
             "type": "object",
             "properties": {
@@ -620,7 +1006,7 @@ TOOLS_SCHEMA = [
     },
     {
         "name": "log_alert",
-        "description": "Registra um alerta no arquivo alertas.json. Tipos: STOP_LOSS, CENARIO_3, LOSS_STREAK, WARNING, INFO",
+        "description": "Registra um alerta no arquivo alertas.jsonl. Tipos: STOP_LOSS, CENARIO_3, LOSS_STREAK, WARNING, INFO",
         "input_schema": {
             "type": "object",
             "properties": {
@@ -638,81 +1024,72 @@ TOOLS_SCHEMA = [
 # DISPATCHER
 # ============================================================
 
-def executar_tool(nome: str, inputs: dict) -> str:
-    """Executa uma tool pelo nome e retorna resultado JSON."""
+def _handle_indicadores(inputs: dict) -> dict:
+    """Tool calcular_indicadores: medias curta/longa, RSI e cruzamento.
 
-    # --- Analise ---
-    if nome == "analisar_sentimento":
-        resultado = analisar_sentimento(inputs["texto"])
-
-    elif nome == "calcular_indicadores":
-        precos = inputs["precos"]
-        pc = inputs.get("periodo_curto", 9)
-        pl = inputs.get("periodo_longo", 21)
-        mm_curta = calcular_media_movel(precos, pc)
-        mm_longa = calcular_media_movel(precos, pl)
-        rsi = calcular_rsi(precos)
-        cruzamento = detectar_cruzamento(mm_curta, mm_longa)
-        resultado = {
-            "rsi": rsi,
-            "media_movel_curta": mm_curta[-3:] if mm_curta else [],
-            "media_movel_longa": mm_longa[-3:] if mm_longa else [],
-            "cruzamento": cruzamento,
-        }
+    Converte os precos para array uma vez; de cada media so as 3 janelas
+    finais sao calculadas (as que vao no retorno e no teste de cruzamento),
+    com os mesmos valores da serie completa.
+    """
+    precos = np.asarray(inputs["precos"], dtype=np.float64)
+    pc = inputs.get("periodo_curto", 9)
+    pl = inputs.get("periodo_longo", 21)
+    mm_curta = calcular_media_movel(precos[-(pc + 2):], pc)
+    mm_longa = calcular_media_movel(precos[-(pl + 2):], pl)
+    return {
+        "rsi": calcular_rsi(precos),
+        "media_movel_curta": mm_curta,
+        "media_movel_longa": mm_longa,
+        "cruzamento": detectar_cruzamento(mm_curta, mm_longa),
+    }
 
-    elif nome == "gerar_sinal_trading":
-        resultado = gerar_sinal(
-            inputs.get("rsi"),
-            inputs.get("cruzamento"),
-            inputs.get("sentimento", {"sentimento": "neutro", "confianca": 0}),
-        )
 
+# Tabela nome da tool -> adaptador(inputs) (lookup O(1) em vez de cadeia de if/elif)
+_TOOL_HANDLERS = {
+    # --- Analise ---
+    "analisar_sentimento": lambda i: analisar_sentimento(i["texto"]),
+    "calcular_indicadores": _handle_indicadores,
+    "gerar_sinal_trading": lambda i: gerar_sinal(
+        i.get("rsi"),
+        i.get("cruzamento"),
+        i.get("sentimento", {"sentimento": "neutro", "confianca": 0}),
+    ),
     # --- Operacao ---
-    elif nome == "read_balance":
-        resultado = skill_read_balance()
-
-    elif nome == "calculate_mg":
-        resultado = skill_calculate_mg(
-            entrada=inputs.get("entrada", 10.0),
-            payout=inputs.get("payout", 0.85),
-            nivel=inputs.get("nivel", 2),
-            fator_correcao=inputs.get("fator_correcao", 1.0),
-        )
-
-    elif nome == "execute_operation":
-        resultado = skill_execute_operation(
-            asset=inputs["asset"],
-            direction=inputs["direction"],
-            amount=inputs["amount"],
-        )
-
-    elif nome == "register_operation":
-        resultado = skill_register_operation(inputs["data"])
-
+    "read_balance": lambda i: skill_read_balance(),
+    "calculate_mg": lambda i: skill_calculate_mg(
+        entrada=i.get("entrada", 10.0),
+        payout=i.get("payout", 0.85),
+        nivel=i.get("nivel", 2),
+        fator_correcao=i.get("fator_correcao", 1.0),
+    ),
+    "execute_operation": lambda i: skill_execute_operation(
+        asset=i["asset"],
+        direction=i["direction"],
+        amount=i["amount"],
+    ),
+    "register_operation": lambda i: skill_register_operation(i["data"]),
     # --- Historico e Relatorio ---
-    elif nome == "read_history":
-        resultado = skill_read_history(
-            limit=inputs.get("limit", 50),
-            asset=inputs.get("asset"),
-        )
-
-    elif nome == "generate_report":
-        resultado = skill_generate_report()
-
+    "read_history": lambda i: skill_read_history(
+        limit=i.get("limit", 50),
+        asset=i.get("asset"),
+    ),
+    "generate_report": lambda i: skill_generate_report(),
     # --- Protecao ---
-    elif nome == "check_protection":
-        resultado = skill_check_protection(
-            limite_perda_pct=inputs.get("limite_perda_pct", 20.0),
-        )
-
-    elif nome == "log_alert":
-        resultado = skill_log_alert(
-            tipo=inputs["tipo"],
-            mensagem=inputs["mensagem"],
-            dados=inputs.get("dados"),
-        )
+    "check_protection": lambda i: skill_check_protection(
+        limite_perda_pct=i.get("limite_perda_pct", 20.0),
+    ),
+    "log_alert": lambda i: skill_log_alert(
+        tipo=i["tipo"],
+        mensagem=i["mensagem"],
+        dados=i.get("dados"),
+    ),
+}
 
-    else:
+def executar_tool(nome: str, inputs: dict) -> str:
+    """Executa uma tool pelo nome e retorna resultado JSON."""
+    handler = _TOOL_HANDLERS.get(nome)
+    if handler is None:
         resultado = {"erro": f"Tool '{nome}' nao encontrada"}
-
-    return json.dumps(resultado, ensure_ascii=False)
+    else:
+        resultado = handler(inputs)
+    return _dumps(resultado)
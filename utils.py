@@ -2,15 +2,16 @@
 utils.py - Utilitarios compartilhados: encoding, log, rede, shutdown, classificacao de ativo.
 """
 
+import re
 import sys
 import time
-import signal
+import errno
 import socket
+import selectors
 import threading
 import asyncio
 import logging
-from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+from functools import lru_cache
 from pathlib import Path
 
 # --- Encoding: garante UTF-8 em qualquer terminal Windows (CMD, PowerShell, etc.) ---
@@ -19,17 +20,24 @@ if hasattr(sys.stdout, "reconfigure"):
 if hasattr(sys.stderr, "reconfigure"):
     sys.stderr.reconfigure(encoding="utf-8", errors="replace")
 
+# Diretorio do projeto (resolvido uma vez no import)
+_BASE_DIR = Path(__file__).resolve().parent
+
 # ============================================================
 # LOG DE SESSAO (sessao.log - rotativo por dia, 30 dias)
 # ============================================================
 
 _logger_sessao: logging.Logger | None = None
+# nivel -> metodo do logger, preenchido por _setup_log (vazio = log desligado)
+_LEVEL_FUNCS: dict = {}
 
 
 def _setup_log():
     """Configura log de sessao rotativo diario. Arquivo: sessao.log."""
+    from logging.handlers import TimedRotatingFileHandler  # so usado aqui
+
     global _logger_sessao
-    log_path = Path(__file__).resolve().parent / "logs" / "sessao.log"
+    log_path = _BASE_DIR / "logs" / "sessao.log"
     handler = TimedRotatingFileHandler(
         log_path, when="midnight", backupCount=30, encoding="utf-8"
     )
@@ -41,40 +49,109 @@ def _setup_log():
     _logger_sessao.setLevel(logging.DEBUG)
     _logger_sessao.addHandler(handler)
     _logger_sessao.propagate = False
+    _LEVEL_FUNCS.update({
+        "INFO": _logger_sessao.info,
+        "WARN": _logger_sessao.warning,
+        "WARNING": _logger_sessao.warning,
+        "ERROR": _logger_sessao.error,
+    })
 
 def log_s(nivel: str, msg: str):
-    """Escreve no sessao.log. nivel: INFO | WARN | ERROR"""
-    if _logger_sessao is None:
-        return
-    n = nivel.upper()
-    if n == "INFO":        _logger_sessao.info(msg)
-    elif n in ("WARN", "WARNING"): _logger_sessao.warning(msg)
-    elif n == "ERROR":     _logger_sessao.error(msg)
-    else:                  _logger_sessao.debug(msg)
+    """Escreve no sessao.log. nivel: INFO | WARN | ERROR
+
+    Niveis em maiusculas caem direto na tabela (_LEVEL_FUNCS); outras grafias
+    passam por .upper() e nivel desconhecido vira debug.
+    """
+    fn = _LEVEL_FUNCS.get(nivel)
+    if fn is None:
+        if _logger_sessao is None:
+            return
+        fn = _LEVEL_FUNCS.get(nivel.upper(), _logger_sessao.debug)
+    fn(msg)
+
+
+def _hora_atual() -> str:
+    """Hora local no formato HH:MM:SS.
+
+    Formata os campos de time.localtime() direto, sem passar pelo strftime
+    (chamado a cada candle/sinal nos loops).
+    """
+    lt = time.localtime()
+    return f"{lt.tm_hour:02d}:{lt.tm_min:02d}:{lt.tm_sec:02d}"
 
 
 # --- Verificador de conexao com a internet ---
-def _verificar_internet(host: str = "8.8.8.8", port: int = 53, timeout: int = 3) -> tuple[bool, float]:
-    """Testa conexao TCP com o DNS publico do Google (8.8.8.8:53).
+# DNS publicos testados em paralelo na validacao de ambiente
+_DESTINOS_REDE = (("8.8.8.8", 53), ("1.1.1.1", 53), ("9.9.9.9", 53))
 
-    Nao envia dados — apenas verifica se a rede responde.
+
+def _verificar_internet_multi(destinos=_DESTINOS_REDE, timeout: float = 3) -> tuple[bool, float]:
+    """Testa varios destinos (IP, porta) ao mesmo tempo; basta um responder.
+
+    Abre um socket nao bloqueante por destino e espera com selectors pelo
+    primeiro handshake concluido (um DNS bloqueado nao derruba o teste).
     Retorna (conectado: bool, latencia_ms: float).
     """
+    sel = selectors.DefaultSelector()
+    socks = []
+    inicio = time.monotonic()
     try:
-        inicio = time.monotonic()
-        sock = socket.create_connection((host, port), timeout=timeout)
-        sock.close()
-        ms = (time.monotonic() - inicio) * 1000
-        return True, ms
+        for destino in destinos:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            socks.append(sock)
+            sock.setblocking(False)
+            err = sock.connect_ex(destino)
+            if err == 0:
+                return True, (time.monotonic() - inicio) * 1000
+            if err in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                sel.register(sock, selectors.EVENT_WRITE)
+
+        deadline = inicio + timeout
+        while sel.get_map():
+            restante = deadline - time.monotonic()
+            if restante <= 0:
+                break
+            for chave, _ in sel.select(restante):
+                if chave.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    return True, (time.monotonic() - inicio) * 1000
+                sel.unregister(chave.fileobj)
+        return False, 0.0
     except OSError:
         return False, 0.0
+    finally:
+        sel.close()
+        for sock in socks:
+            sock.close()
+
+
+async def _verificar_internet_async(host: str = "8.8.8.8", port: int = 53, timeout: float = 2.0) -> tuple[bool, float]:
+    """Versao async do teste de conexao para uso dentro dos loops.
+
+    Usa asyncio.open_connection: nao bloqueia o event loop durante o handshake.
+    Retorna (conectado: bool, latencia_ms: float).
+    """
+    try:
+        inicio = time.perf_counter()
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=timeout)
+        writer.close()
+        ms = (time.perf_counter() - inicio) * 1000
+        return True, ms
+    except (OSError, asyncio.TimeoutError):
+        return False, 0.0
 
 
 # --- Validacao de ambiente: Python, .env e internet ---
 def _validar_ambiente():
     """Verifica requisitos minimos antes de iniciar. Aborta com mensagem clara se falhar."""
+    from concurrent.futures import ThreadPoolExecutor
+
     erros = []
 
+    # Teste de rede dispara primeiro: o handshake corre enquanto o .env e lido
+    pool = ThreadPoolExecutor(max_workers=1)
+    teste_rede = pool.submit(_verificar_internet_multi)
+    pool.shutdown(wait=False)
+
     # Python >= 3.12
     if sys.version_info < (3, 12):
         erros.append(
@@ -83,7 +160,7 @@ def _validar_ambiente():
         )
 
     # Arquivo .env
-    env_path = Path(__file__).resolve().parent / ".env"
+    env_path = _BASE_DIR / ".env"
     if not env_path.exists():
         erros.append(
             ".env nao encontrado.\n"
@@ -109,7 +186,10 @@ def _validar_ambiente():
 
     # Conexao com a internet
     print("  [REDE] Testando conexao com a internet...", end=" ", flush=True)
-    ok, ms = _verificar_internet()
+    try:
+        ok, ms = teste_rede.result(timeout=4)
+    except Exception:
+        ok, ms = False, 0.0
     if ok:
         print(f"OK ({ms:.0f}ms)")
     else:
@@ -134,6 +214,10 @@ def _validar_ambiente():
 # ============================================================
 
 _shutdown_gracioso = threading.Event()
+# Espelho asyncio da flag (criado no event loop que instalou o handler):
+# acorda _sleep_cancelavel na hora, sem polling
+_shutdown_async: asyncio.Event | None = None
+_shutdown_loop: asyncio.AbstractEventLoop | None = None
 
 
 def _instalar_shutdown_gracioso():
@@ -144,8 +228,17 @@ def _instalar_shutdown_gracioso():
 
     Retorna o handler original para restaurar depois.
     """
+    import signal
+
+    global _shutdown_async, _shutdown_loop
     _shutdown_gracioso.clear()
     handler_original = signal.getsignal(signal.SIGINT)
+    try:
+        loop = asyncio.get_running_loop()
+        evento = asyncio.Event()
+    except RuntimeError:
+        loop = evento = None
+    _shutdown_loop, _shutdown_async = loop, evento
 
     def _handler(*_):
         if _shutdown_gracioso.is_set():
@@ -155,6 +248,11 @@ def _instalar_shutdown_gracioso():
         print("\n\n  [!] Ctrl+C recebido. Aguardando operacao atual finalizar...")
         print("      Pressione Ctrl+C novamente para saida imediata.\n")
         _shutdown_gracioso.set()
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(evento.set)
+            except RuntimeError:  # loop ja encerrado
+                pass
 
     signal.signal(signal.SIGINT, _handler)
     return handler_original
@@ -162,16 +260,37 @@ def _instalar_shutdown_gracioso():
 
 def _restaurar_shutdown(handler_original):
     """Restaura handler original de Ctrl+C e limpa a flag."""
+    import signal
+
+    global _shutdown_async, _shutdown_loop
     signal.signal(signal.SIGINT, handler_original)
     _shutdown_gracioso.clear()
+    _shutdown_loop = _shutdown_async = None
 
 
-async def _sleep_cancelavel(segundos: int):
-    """Sleep em blocos de 1s para checar flag de shutdown rapidamente."""
-    for _ in range(segundos):
-        if _shutdown_gracioso.is_set():
+async def _sleep_cancelavel(segundos: float):
+    """Sleep que termina antes se a flag de shutdown for setada (Ctrl+C).
+
+    Com o handler instalado neste event loop, espera o evento asyncio com
+    timeout: um unico timer e acorda imediatamente no Ctrl+C. Fora disso,
+    cai no polling da flag a cada 0.25s ate um deadline monotonic.
+    """
+    if _shutdown_gracioso.is_set():
+        return
+    evento = _shutdown_async
+    if evento is not None and _shutdown_loop is asyncio.get_running_loop():
+        try:
+            await asyncio.wait_for(evento.wait(), timeout=segundos)
+        except asyncio.TimeoutError:
+            pass
+        return
+
+    deadline = time.monotonic() + segundos
+    while not _shutdown_gracioso.is_set():
+        restante = deadline - time.monotonic()
+        if restante <= 0:
             return
-        await asyncio.sleep(1)
+        await asyncio.sleep(min(0.25, restante))
 
 
 # ============================================================
@@ -212,33 +331,38 @@ _COMMODITY_KEYWORDS = frozenset({
     "LUMBER", "SOYBEAN", "NATURAL",
 })
 
+# "/" vira espaco: partes do par separadas por um unico split()
+_BARRA_ESPACO = str.maketrans({"/": " "})
+# Marcadores de modalidade removidos do nome antes de classificar
+_TAGS_RE = re.compile(r"\((?:OTC|Digital)\)")
+# Materia-prima: palavra-chave em qualquer posicao (substring)
+_COMMODITY_RE = re.compile("|".join(sorted(_COMMODITY_KEYWORDS, key=len, reverse=True)))
+
 
+@lru_cache(maxsize=2048)
 def _classificar_ativo(nome_display: str) -> str:
     """Classifica ativo por tipo de mercado a partir do nome de exibicao.
 
     Retorna: FOREX | CRIPTO | MATERIA_PRIMA | ACAO
+    Memoizado: os mesmos ativos se repetem a cada varredura de payouts.
     """
-    nome_limpo = nome_display.replace("(OTC)", "").replace("(Digital)", "").strip()
+    nome_limpo = _TAGS_RE.sub("", nome_display).strip()
     nome_upper = nome_limpo.upper()
 
-    # Cripto: qualquer parte do par e simbolo cripto
-    partes = [p.strip() for p in nome_limpo.replace("/", " ").split() if p.strip()]
-    for parte in partes:
-        if parte.upper() in _CRYPTO_SYMBOLS:
-            return "CRIPTO"
+    # Cripto: qualquer parte do par (separada por espaco ou "/") e simbolo cripto
+    if not _CRYPTO_SYMBOLS.isdisjoint(nome_upper.translate(_BARRA_ESPACO).split()):
+        return "CRIPTO"
 
     # Materia-prima: nome contem palavra-chave de commodity
-    for keyword in _COMMODITY_KEYWORDS:
-        if keyword in nome_upper:
-            return "MATERIA_PRIMA"
+    if _COMMODITY_RE.search(nome_upper):
+        return "MATERIA_PRIMA"
 
     # Forex: padrao XXX/YYY com dois codigos de exatamente 3 letras
-    if "/" in nome_limpo:
-        lados = nome_limpo.split("/")
-        if len(lados) == 2:
-            a, b = lados[0].strip(), lados[1].strip()
-            if len(a) == 3 and a.isalpha() and len(b) == 3 and b.isalpha():
-                return "FOREX"
+    a, barra, b = nome_limpo.partition("/")
+    if barra and "/" not in b:
+        a, b = a.strip(), b.strip()
+        if len(a) == 3 and a.isalpha() and len(b) == 3 and b.isalpha():
+            return "FOREX"
 
     # Forex: formato interno XXXXXX (6 letras, ex: AUDUSD, CADJPY)
     if len(nome_upper) == 6 and nome_upper.isalpha():
@@ -248,19 +372,29 @@ def _classificar_ativo(nome_display: str) -> str:
     return "ACAO"
 
 
+@lru_cache(maxsize=64)
+def _parse_hm(hhmm: str) -> int | None:
+    """Converte "HH:MM" em minutos desde 00:00. Vazio -> None; invalido -> ValueError."""
+    if not hhmm:
+        return None
+    h, _, m = hhmm.partition(":")
+    return int(h) * 60 + int(m)
+
+
 def _esta_no_horario(cfg: dict) -> bool:
     """Retorna True se hora atual esta dentro da janela de operacao configurada.
 
     Usa as chaves 'horario_inicio' e 'horario_fim' do config (formato "HH:MM").
-    Se qualquer uma estiver vazia, retorna True (sem restricao).
+    Se qualquer uma estiver vazia, retorna True (sem restricao); horario
+    invalido retorna False (nao opera fora de uma janela conhecida).
+    Compara minutos do dia (inteiros): sem datetime nem strftime por chamada.
     """
-    inicio = cfg.get("horario_inicio", "").strip()
-    fim    = cfg.get("horario_fim", "").strip()
-    if not inicio or not fim:
-        return True
     try:
-        agora = datetime.now().strftime("%H:%M")
-        return inicio <= agora <= fim
+        inicio = _parse_hm(cfg.get("horario_inicio", "").strip())
+        fim    = _parse_hm(cfg.get("horario_fim", "").strip())
+        if inicio is None or fim is None:
+            return True
+        agora = time.localtime()
+        return inicio <= agora.tm_hour * 60 + agora.tm_min <= fim
     except Exception:
-        return True
-
+        return False